@@ -30,8 +30,8 @@ IGNORED = "IGNORED"  # hub is not part of the request
 DELETE = "DELETE"    # delete a request
 
 # mandatory message fields
-__MANDATORY_FIELDS = ("username", "prefix", "destination_dir", "host",
-                      "version")
+__MANDATORY_FIELDS = frozenset(("username", "prefix", "destination_dir",
+                                "host", "version"))
 
 
 class ID(object):
@@ -47,7 +47,11 @@ class ID(object):
             cls.__seed = (cls.__seed + 1) % 0xFFFFFF
         packed = struct.pack('>i', int(time.time()))
         packed += struct.pack('>i', val)[1:4]
-        return binascii.hexlify(packed)
+        idstr = binascii.hexlify(packed)
+        if not isinstance(idstr, str):
+            # Python 3 returns bytes, which cannot be serialized as JSON
+            idstr = idstr.decode("ascii")
+        return idstr
 
 
 def dict_to_message(mdict, allow_old_format=False):
@@ -234,6 +234,79 @@ class HsSender(HsBase):
 
         return True
 
+    def __drain_reporter(self, force_spade):
+        """
+        Handle any worker messages which are already queued on the
+        reporter socket so we don't need another poll() for each one
+        """
+        rtnval = True
+        while True:
+            # only hold the ping manager's lock for one message at a time
+            #  so a burst of worker messages can't hold off the pings
+            with self.__ping_manager.lock:
+                try:
+                    mdict = self.__reporter.recv_json(flags=zmq.NOBLOCK)
+                except zmq.Again:
+                    break
+
+                if mdict is None:
+                    rtnval = False
+                    break
+
+                rtnval &= self.__process_dict(self.__reporter, mdict,
+                                              force_spade=force_spade)
+
+        return rtnval
+
+    def __process_dict(self, sock, mdict, force_spade=False):
+        if not isinstance(mdict, dict):
+            raise HsException("Received %s(%s), not dictionary" %
+                              (mdict, type(mdict).__name__))
+
+        if sock == self.__reporter and "pingback" in mdict:
+            self.__ping_manager.add_reply(mdict["pingback"])
+            return True
+
+        error = True
+        try:
+            msg = HsMessage.from_dict(mdict, allow_old_format=True)
+            if msg is None:
+                return False
+            error = False
+        except HsException:
+            raise
+        except:
+            logging.exception("Cannot receive message from %s",
+                              sock.identity)
+
+        found = False
+        if not error:
+            try:
+                self.__monitor.add_message(msg, force_spade)
+                found = True
+            except:
+                logging.exception("Received bad message %s", str(msg))
+                error = True
+
+        if sock == self.__alert_socket:
+            if error:
+                rtnmsg = "ERROR"
+            else:
+                rtnmsg = "DONE"
+
+            # reply to requester:
+            #  added \0 to fit C/C++ zmq message termination
+            try:
+                answer = sock.send(rtnmsg + "\0")
+                if answer is not None:
+                    logging.error("Failed sending %s to requester: %s",
+                                  rtnmsg, answer)
+            except zmq.ZMQError:
+                logging.exception("Cannot return \"%s\" to %s", rtnmsg,
+                                  sock.identity)
+
+        return found
+
     def close_all(self):
         self.__ping_manager.stop_thread()
 
@@ -287,6 +360,10 @@ class HsSender(HsBase):
 
         raise SystemExit(1)
 
+    def flush_monitor_state(self, timeout=5.0):
+        "Discard all RequestMonitor state (used by unit tests)"
+        return self.__monitor.flush_state(timeout)
+
     @property
     def has_monitor(self):
         return self.__monitor is not None and self.__monitor.is_alive()
@@ -314,6 +391,8 @@ class HsSender(HsBase):
             with self.__ping_manager.lock:
                 rtnval &= self.process_one_message(sock,
                                                    force_spade=force_spade)
+            if sock == self.__reporter:
+                rtnval &= self.__drain_reporter(force_spade)
 
         return rtnval
 
@@ -322,53 +401,7 @@ class HsSender(HsBase):
         if mdict is None:
             return False
 
-        if not isinstance(mdict, dict):
-            raise HsException("Received %s(%s), not dictionary" %
-                              (mdict, type(mdict).__name__))
-
-        if sock == self.__reporter and "pingback" in mdict:
-            self.__ping_manager.add_reply(mdict["pingback"])
-            return True
-
-        error = True
-        try:
-            msg = HsMessage.from_dict(mdict, allow_old_format=True)
-            if msg is None:
-                return False
-            error = False
-        except HsException:
-            raise
-        except:
-            logging.exception("Cannot receive message from %s",
-                              sock.identity)
-
-        found = False
-        if not error:
-            try:
-                self.__monitor.add_message(msg, force_spade)
-                found = True
-            except:
-                logging.exception("Received bad message %s", str(msg))
-                error = True
-
-        if sock == self.__alert_socket:
-            if error:
-                rtnmsg = "ERROR"
-            else:
-                rtnmsg = "DONE"
-
-            # reply to requester:
-            #  added \0 to fit C/C++ zmq message termination
-            try:
-                answer = sock.send(rtnmsg + "\0")
-                if answer is not None:
-                    logging.error("Failed sending %s to requester: %s",
-                                  rtnmsg, answer)
-            except zmq.ZMQError:
-                logging.exception("Cannot return \"%s\" to %s", rtnmsg,
-                                  sock.identity)
-
-        return found
+        return self.__process_dict(sock, mdict, force_spade=force_spade)
 
     @property
     def monitor_started(self):
@@ -495,11 +528,13 @@ class HsSender(HsBase):
 
         return result
 
-    def wait_for_idle(self):
-        for _ in range(10):
-            if self.__monitor.is_idle:
-                break
-            time.sleep(0.1)
+    def wait_for_idle(self, timeout=1.0):
+        "Wait for the RequestMonitor to finish all its work"
+        return self.__monitor.wait_for_idle(timeout)
+
+    def wait_for_monitor(self, timeout=None):
+        "Wait for the RequestMonitor thread to start (used by unit tests)"
+        return self.__monitor.wait_for_start(timeout)
 
     @property
     def workers(self):
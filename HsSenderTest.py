@@ -6,9 +6,9 @@ import numbers
 import os
 import re
 import shutil
+import sys
 import tarfile
 import tempfile
-import time
 import traceback
 import unittest
 
@@ -21,11 +21,64 @@ import HsUtil
 from HsBase import HsBase
 from HsException import HsException
 from HsTestUtil import Mock0MQPoller, Mock0MQSocket, MockHitspool, \
-    MockI3Socket, TIME_PAT, set_state_db_path
+    MockI3Socket, SCRATCH_DIR, TIME_PAT, clear_directory, link_tree, \
+    set_state_db_path
 from LoggingTestCase import LoggingTestCase
 from RequestMonitor import RequestMonitor
 
 
+if sys.version_info >= (3, 0):
+    # pylint: disable=invalid-name
+    # unicode isn't present in Python3
+    unicode = str
+
+
+# HsSender file name suffixes (these never change during a test run)
+TAR_SUFFIX = HsSender.HsSender.TAR_SUFFIX
+META_SUFFIX = HsSender.HsSender.META_SUFFIX
+SEM_SUFFIX = HsSender.HsSender.SEM_SUFFIX
+# suffix of the file which tells SPADE the tar file is ready
+if HsSender.HsSender.WRITE_META_XML:
+    SPADE_SEM_SUFFIX = META_SUFFIX
+else:
+    SPADE_SEM_SUFFIX = SEM_SUFFIX
+
+# log message emitted when the RequestMonitor rejects a message
+BAD_MSG_PAT = re.compile(r"Received bad message .*")
+
+# body of the alert email sent when a request starts
+NOTIFY_FORMAT = "Start: %s\nStop: %s\n(no possible leapseconds applied)"
+# cache of (start_ticks, stop_ticks)->compiled alert email pattern
+NOTIFY_PATTERNS = {}
+
+
+def notify_pattern(start_ticks, stop_ticks):
+    "Return the (cached) pattern which matches a request's alert email"
+    key = (start_ticks, stop_ticks)
+    if key not in NOTIFY_PATTERNS:
+        notify_txt = NOTIFY_FORMAT % (DAQTime.ticks_to_utc(start_ticks),
+                                      DAQTime.ticks_to_utc(stop_ticks))
+        NOTIFY_PATTERNS[key] = re.compile(r".*" + re.escape(notify_txt),
+                                          flags=re.MULTILINE)
+    return NOTIFY_PATTERNS[key]
+
+
+# template for incoming worker messages; tests copy it and tweak fields
+BASE_RCV_MSG = {
+    "msgtype": None,
+    "request_id": None,
+    "username": None,
+    "start_time": None,
+    "stop_time": None,
+    "copy_dir": None,
+    "destination_dir": None,
+    "prefix": None,
+    "extract": None,
+    "host": None,
+    "version": None,
+}
+
+
 class MySender(HsSender.HsSender):
     """
     Use mock 0MQ sockets for testing
@@ -39,8 +92,8 @@ class MySender(HsSender.HsSender):
 
         # unit tests were running to completion before the RequestMonitor had
         # started, causing tearDown() to hang on `monitor.join()`
-        while not self.monitor_started:
-            time.sleep(0.1)
+        if not self.wait_for_monitor(timeout=5.0):
+            raise Exception("RequestMonitor did not start")
 
         if verbose:
             self.__i3_sock.set_verbose()
@@ -67,6 +120,18 @@ class MySender(HsSender.HsSender):
         self.__rptr_sock = Mock0MQSocket("Reporter")
         return self.__rptr_sock
 
+    def reset_mocks(self):
+        """
+        Clear all mock socket state and cached requests so this sender
+        can be reused by the next test
+        """
+        for sock in (self.__rptr_sock, self.__poll_sock, self.__i3_sock):
+            if sock is not None:
+                sock.clear()
+
+        if not self.flush_monitor_state():
+            raise Exception("RequestMonitor state was not flushed")
+
     def validate(self):
         """
         Check that all expected messages were received by mock sockets
@@ -111,15 +176,23 @@ class FailableSender(MySender):
     def remove_tree(self, path):
         pass
 
+    def reset_mocks(self):
+        super(FailableSender, self).reset_mocks()
+
+        self.__fail_move_file = False
+        self.__fail_touch_file = False
+        self.__fail_tar_file = False
+        self.__moved_files = False
+
     def write_meta_xml(self, spadedir, basename, start_ticks, stop_ticks):
         if self.__fail_touch_file:
             raise HsException("Fake Touch Error")
-        return basename + HsSender.HsSender.META_SUFFIX
+        return basename + META_SUFFIX
 
     def write_sem(self, spadedir, basename):
         if self.__fail_touch_file:
             raise HsException("Fake Touch Error")
-        return basename + HsSender.HsSender.SEM_SUFFIX
+        return basename + SEM_SUFFIX
 
     def write_tarfile(self, sourcedir, sourcefiles, tarname):
         if self.__fail_tar_file > 0:
@@ -136,6 +209,13 @@ class MockRequestBuilder(object):
     HESE = 2
     ANON = 3
 
+    # map request types to directory name prefixes
+    CATEGORY_MAP = {
+        SNDAQ: "SNALERT",
+        HESE: "HESE",
+        ANON: "ANON",
+    }
+
     USRDIR = None
 
     def __init__(self, req_id, req_type, username, start_ticks, stop_ticks,
@@ -157,6 +237,9 @@ class MockRequestBuilder(object):
         self.__firstfile = firstfile
         self.__numfiles = numfiles
 
+        # formatted start/stop times, filled in by __utc_strings()
+        self.__time_strings = None
+
         # create initial directory
         category = self.__get_category(req_type)
         self.__hsdir = MockHitspool.create_copy_files(category, timetag, host,
@@ -170,27 +253,31 @@ class MockRequestBuilder(object):
                                       "%s_%s_%s" % (category, timetag, host))
 
     def __get_category(self, reqtype):
-        if reqtype == self.SNDAQ:
-            return "SNALERT"
-        if reqtype == self.HESE:
-            return "HESE"
-        if reqtype == self.ANON:
-            return "ANON"
+        if reqtype in self.CATEGORY_MAP:
+            return self.CATEGORY_MAP[reqtype]
         if isinstance(reqtype, (str, unicode)):
             return reqtype
         raise NotImplementedError("Unknown request type #%s" % reqtype)
 
+    def __utc_strings(self):
+        "Return formatted start and stop times, computing them only once"
+        if self.__time_strings is None:
+            start_utc = DAQTime.ticks_to_utc(self.__start_ticks)
+            stop_utc = DAQTime.ticks_to_utc(self.__stop_ticks)
+            self.__time_strings = (start_utc.strftime(DAQTime.TIME_FORMAT),
+                                   stop_utc.strftime(DAQTime.TIME_FORMAT))
+        return self.__time_strings
+
     def add_i3live_message(self, i3socket, status, success=None, failed=None):
-        start_utc = DAQTime.ticks_to_utc(self.__start_ticks)
-        stop_utc = DAQTime.ticks_to_utc(self.__stop_ticks)
+        start_str, stop_str = self.__utc_strings()
 
         # build I3Live success message
         value = {
             'status': status,
             'request_id': self.__req_id,
             'username': self.__username,
-            'start_time': start_utc.strftime(DAQTime.TIME_FORMAT),
-            'stop_time': stop_utc.strftime(DAQTime.TIME_FORMAT),
+            'start_time': start_str,
+            'stop_time': stop_str,
             'destination_dir': self.__destdir,
             'prefix': None,
             'update_time': TIME_PAT,
@@ -264,33 +351,26 @@ class MockRequestBuilder(object):
             raise TestException("Moved directory \"%s\" does not exist" %
                                 subdir)
 
-        flist = []
-        for entry in os.listdir(subdir):
-            flist.append(entry)
-
-        self.check_hitspool_file_list(flist, self.__firstfile, self.__numfiles)
+        self.check_hitspool_file_list(os.listdir(subdir), self.__firstfile,
+                                      self.__numfiles)
 
     @classmethod
     def check_hitspool_file_list(cls, flist, firstfile, numfiles):
-        flist.sort()
-
-        for fnum in range(firstfile, firstfile + numfiles):
-            fname = "HitSpool-%d" % fnum
-            if len(flist) == 0:
-                raise TestException("Not all files were copied"
-                                    " (found %d of %d)" %
-                                    (fnum - firstfile, numfiles))
-
-            if fname != flist[0]:
-                raise TestException("Expected file #%d to be \"%s\""
-                                    " not \"%s\"" %
-                                    (fnum - firstfile, fname, flist[0]))
-
-            del flist[0]
-
-        if len(flist) != 0:
+        expected = set("HitSpool-%d" % fnum
+                       for fnum in range(firstfile, firstfile + numfiles))
+        found = set(flist)
+
+        missing = expected - found
+        if missing:
+            raise TestException("Not all files were copied"
+                                " (found %d of %d, missing %s)" %
+                                (numfiles - len(missing), numfiles,
+                                 sorted(missing)))
+
+        extra = found - expected
+        if extra:
             raise TestException("%d extra files were copied (%s)" %
-                                (len(flist), flist))
+                                (len(extra), sorted(extra)))
 
     @classmethod
     def create_user_dir(cls):
@@ -308,10 +388,7 @@ class MockRequestBuilder(object):
     def destroy(cls):
         if cls.USRDIR is not None:
             # clear lingering files
-            try:
-                shutil.rmtree(cls.USRDIR)
-            except:
-                pass
+            shutil.rmtree(cls.USRDIR, ignore_errors=True)
             cls.USRDIR = None
 
     @classmethod
@@ -334,28 +411,16 @@ class MockRequestBuilder(object):
         return self.__req_id
 
 
-class HsSenderTest(LoggingTestCase):
-    # pylint: disable=too-many-public-methods
-    # Really?!?!  In a test class?!?!  Shut up, pylint!
+class SenderTestCase(LoggingTestCase):
+    """
+    Base class for tests which share a single sender across all the
+    test methods in a TestCase.  Subclasses override create_sender().
+    """
 
     SENDER = None
     CACHED_COPY_PATH = None
-
-    def __check_hitspool_file_list(self, flist, firstnum, numfiles):
-        flist.sort()
-
-        for fnum in range(firstnum, firstnum + numfiles):
-            fname = "HitSpool-%d" % fnum
-            if len(flist) == 0:
-                self.fail("Not all files were copied (found %d of %d)" %
-                          (fnum - firstnum, numfiles))
-
-            self.assertEqual(fname, flist[0],
-                             "Expected file #%d to be \"%s\" not \"%s\"" %
-                             (fnum - firstnum, fname, flist[0]))
-            del flist[0]
-        if len(flist) != 0:
-            self.fail("%d extra files were copied (%s)" % (len(flist), flist))
+    # tests only check WARN and above unless they lower the level
+    DEFAULT_LOG_LEVEL = logging.WARN
 
     @classmethod
     def close_all_senders(cls):
@@ -373,65 +438,81 @@ class HsSenderTest(LoggingTestCase):
         return found_error
 
     @classmethod
-    def set_sender(cls, sndr):
-        cls.SENDER = sndr
+    def create_sender(cls):
+        raise NotImplementedError()
 
-    def setUp(self):
-        super(HsSenderTest, self).setUp()
-        # by default, check all log messages
-        self.setLogLevel(0)
+    @classmethod
+    def remove_state_db(cls):
+        "Get rid of HsSender's state database"
+        dbpath = RequestMonitor.get_db_path()
+        if os.path.exists(dbpath):
+            os.unlink(dbpath)
+
+    @classmethod
+    def setUpClass(cls):
+        super(SenderTestCase, cls).setUpClass()
 
         # point the RequestMonitor at a temporary state file for tests
         set_state_db_path()
+        cls.remove_state_db()
 
-        # get rid of HsSender's state database
-        dbpath = RequestMonitor.get_db_path()
-        if os.path.exists(dbpath):
-            os.unlink(dbpath)
+        cls.set_copy_path()
 
-        self.set_copy_path()
+        # most tests use the same three hitspool files, so only write them once
+        # (keep the template on the same filesystem so files can be linked)
+        MockHitspool.create_template(11, 3, parent=SCRATCH_DIR)
 
-    def tearDown(self):
-        try:
-            super(HsSenderTest, self).tearDown()
-        finally:
-            found_error = False
+        # starting a sender (and its RequestMonitor thread) is expensive,
+        # so all tests in this class share a single instance
+        cls.SENDER = cls.create_sender()
 
-            self.restore_copy_path()
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            found_error = cls.close_all_senders()
 
-            # clear lingering files
             try:
-                MockHitspool.destroy()
+                cls.remove_state_db()
             except:
                 traceback.print_exc()
                 found_error = True
 
-            try:
-                MockRequestBuilder.destroy()
-            except:
-                traceback.print_exc()
-                found_error = True
+            MockHitspool.destroy_template()
+            cls.restore_copy_path()
 
-            # close all sockets
+            if found_error:
+                raise Exception("Found one or more errors during tear-down")
+        finally:
+            super(SenderTestCase, cls).tearDownClass()
 
-            found_error |= self.close_all_senders()
+    def setUp(self):
+        super(SenderTestCase, self).setUp()
+        # don't check DEBUG/INFO log messages
+        self.setLogLevel(self.DEFAULT_LOG_LEVEL)
 
-            # get rid of HsSender's state database
-            dbpath = RequestMonitor.get_db_path()
-            if os.path.exists(dbpath):
-                try:
-                    os.unlink(dbpath)
-                except:
-                    traceback.print_exc()
-                    found_error = True
+        # throw away anything left over from the previous test
+        self.SENDER.reset_mocks()
+        clear_directory(HsBase.DEFAULT_COPY_PATH)
 
-            if found_error:
-                self.fail("Found one or more errors during tear-down")
+    def tearDown(self):
+        try:
+            super(SenderTestCase, self).tearDown()
+        finally:
+            # clear lingering files
+            MockRequestBuilder.destroy()
+
+            if not self.SENDER.has_monitor:
+                self.fail("Sender monitor has died")
 
     @classmethod
     def set_copy_path(cls):
+        """
+        Create a single (RAM-backed, if possible) copy directory which is
+        used by both the sender and MockHitspool for all tests in this class
+        """
         cls.CACHED_COPY_PATH = HsBase.DEFAULT_COPY_PATH
-        HsBase.set_default_copy_path(tempfile.mkdtemp())
+        HsBase.set_default_copy_path(tempfile.mkdtemp(dir=SCRATCH_DIR))
+        MockHitspool.COPY_DIR = HsBase.DEFAULT_COPY_PATH
 
     @classmethod
     def restore_copy_path(cls):
@@ -444,10 +525,18 @@ class HsSenderTest(LoggingTestCase):
                         HsBase.DEFAULT_COPY_PATH = cls.CACHED_COPY_PATH
             finally:
                 cls.CACHED_COPY_PATH = None
+                MockHitspool.COPY_DIR = None
+
+
+class HsFailableSenderTest(SenderTestCase):
+    "Tests which need a sender with injectable failures"
+
+    @classmethod
+    def create_sender(cls):
+        return FailableSender()
 
     def test_bad_dir_name(self):
-        sender = FailableSender()
-        self.set_sender(sender)
+        sender = self.SENDER
 
         # initialize HitSpool file parameters
         firstnum = 11
@@ -459,9 +548,6 @@ class HsSenderTest(LoggingTestCase):
                                                real_stuff=True)
         usrdir = os.path.join(MockHitspool.COPY_DIR, "UserCopy")
 
-        # don't check DEBUG/INFO log messages
-        self.setLogLevel(logging.WARN)
-
         # run it!
         sender.move_to_destination_dir(hsdir, usrdir)
 
@@ -472,8 +558,7 @@ class HsSenderTest(LoggingTestCase):
         sender.validate()
 
     def test_no_move(self):
-        sender = FailableSender()
-        self.set_sender(sender)
+        sender = self.SENDER
 
         # initialize HitSpool file parameters
         firstnum = 11
@@ -488,9 +573,6 @@ class HsSenderTest(LoggingTestCase):
         else:
             usrdir = os.path.dirname(hsdir)
 
-        # don't check DEBUG/INFO log messages
-        self.setLogLevel(logging.WARN)
-
         # run it!
         sender.move_to_destination_dir(hsdir, usrdir)
 
@@ -501,8 +583,7 @@ class HsSenderTest(LoggingTestCase):
         sender.validate()
 
     def test_copy_sn_alert(self):
-        sender = FailableSender()
-        self.set_sender(sender)
+        sender = self.SENDER
 
         # initialize HitSpool file parameters
         firstnum = 11
@@ -514,9 +595,6 @@ class HsSenderTest(LoggingTestCase):
                                                real_stuff=True)
         usrdir = os.path.join(MockHitspool.COPY_DIR, "UserCopy")
 
-        # don't check DEBUG/INFO log messages
-        self.setLogLevel(logging.WARN)
-
         # run it!
         sender.move_to_destination_dir(hsdir, usrdir)
 
@@ -526,27 +604,8 @@ class HsSenderTest(LoggingTestCase):
         # make sure 0MQ communications checked out
         sender.validate()
 
-    def test_real_copy_sn_alert(self):
-        sender = MySender(verbose=False)
-        self.set_sender(sender)
-
-        req = MockRequestBuilder(None, MockRequestBuilder.SNDAQ, None, None,
-                                 None, "12345678_987654", "ichub01", 11, 3)
-
-        # don't check DEBUG/INFO log messages
-        self.setLogLevel(logging.WARN)
-
-        # run it!
-        sender.move_to_destination_dir(req.hsdir, req.destdir)
-
-        req.check_files()
-
-        # make sure 0MQ communications checked out
-        sender.validate()
-
     def test_spade_data_nonstandard_prefix(self):
-        sender = FailableSender()
-        self.set_sender(sender)
+        sender = self.SENDER
 
         # initialize directory parts
         category = "SomeCategory"
@@ -557,15 +616,9 @@ class HsSenderTest(LoggingTestCase):
         firstnum = 11
         numfiles = 3
 
-        # don't check DEBUG/INFO log messages
-        self.setLogLevel(logging.WARN)
-
         mybase = "%s_%s_%s" % (category, timetag, host)
-        mytar = "%s%s" % (mybase, HsSender.HsSender.TAR_SUFFIX)
-        if HsSender.HsSender.WRITE_META_XML:
-            mysem = "%s%s" % (mybase, HsSender.HsSender.META_SUFFIX)
-        else:
-            mysem = "%s%s" % (mybase, HsSender.HsSender.SEM_SUFFIX)
+        mytar = mybase + TAR_SUFFIX
+        mysem = mybase + SPADE_SEM_SUFFIX
 
         # create real directories
         hsdir = MockHitspool.create_copy_files(category, timetag, host,
@@ -591,11 +644,8 @@ class HsSenderTest(LoggingTestCase):
         # make sure 0MQ communications checked out
         sender.validate()
 
-    def test_spade_data_fail_tar(self):
-        sender = FailableSender()
-        self.set_sender(sender)
-
-        sender.fail_create_tar_file()
+    def test_spade_data_failures(self):
+        sender = self.SENDER
 
         # initialize directory parts
         category = "SNALERT"
@@ -611,97 +661,56 @@ class HsSenderTest(LoggingTestCase):
                                                firstnum, numfiles,
                                                real_stuff=False)
 
-        # don't check DEBUG/INFO log messages
-        self.setLogLevel(logging.WARN)
-
-        # add all expected log messages
-        self.expect_log_message("Fake Tar Error")
-        self.expect_log_message("Please put the data manually in the SPADE"
-                                " directory. Use HsSpader.py, for example.")
-
-        # run it!
-        result = sender.spade_pickup_data(hsdir, "ignored", prefix=category)
-        self.assertIsNone(result, "spade_pickup_data() should return None,"
-                          " not %s" % str(result))
-
-        # make sure 0MQ communications checked out
-        sender.validate()
-
-    def test_spade_data_fail_move(self):
-        sender = FailableSender()
-        self.set_sender(sender)
-
-        sender.fail_move_file()
-
-        # initialize directory parts
-        category = "SNALERT"
-        timetag = "12345678_987654"
-        host = "ichub07"
-
-        # initialize HitSpool file parameters
-        firstnum = 11
-        numfiles = 3
+        for name, fail_method, errmsg in (
+                ("tar", sender.fail_create_tar_file, "Fake Tar Error"),
+                ("move", sender.fail_move_file, "Fake Move Error"),
+                ("sem", sender.fail_create_sem_file, "Fake Touch Error"),
+        ):
+            # only inject one failure at a time
+            sender.reset_mocks()
+            fail_method()
+
+            # add all expected log messages
+            self.expect_log_message(errmsg)
+            self.expect_log_message("Please put the data manually in the"
+                                    " SPADE directory. Use HsSpader.py,"
+                                    " for example.")
+
+            # run it!
+            result = sender.spade_pickup_data(hsdir, "ignored",
+                                              prefix=category)
+            self.assertIsNone(result, "%s failure: spade_pickup_data()"
+                              " should return None, not %s" %
+                              (name, str(result)))
+
+            # make sure 0MQ communications checked out
+            sender.validate()
+
+
+class HsSenderTest(SenderTestCase):
+    # pylint: disable=too-many-public-methods
+    # Really?!?!  In a test class?!?!  Shut up, pylint!
 
-        # create bad directory name
-        hsdir = MockHitspool.create_copy_files(category, timetag, host,
-                                               firstnum, numfiles,
-                                               real_stuff=False)
+    @classmethod
+    def create_sender(cls):
+        return MySender(verbose=False)
 
-        # don't check DEBUG/INFO log messages
-        self.setLogLevel(logging.WARN)
+    def test_real_copy_sn_alert(self):
+        sender = self.SENDER
 
-        # add all expected log messages
-        self.expect_log_message("Fake Move Error")
-        self.expect_log_message("Please put the data manually in the SPADE"
-                                " directory. Use HsSpader.py, for example.")
+        req = MockRequestBuilder(None, MockRequestBuilder.SNDAQ, None, None,
+                                 None, "12345678_987654", "ichub01", 11, 3)
 
         # run it!
-        result = sender.spade_pickup_data(hsdir, "ignored", prefix=category)
-        self.assertIsNone(result, "spade_pickup_data() should return None,"
-                          " not %s" % str(result))
-
-        # make sure 0MQ communications checked out
-        sender.validate()
-
-    def test_spade_data_fail_sem(self):
-        sender = FailableSender()
-        self.set_sender(sender)
-
-        sender.fail_create_sem_file()
-
-        # initialize directory parts
-        category = "SNALERT"
-        timetag = "12345678_987654"
-        host = "ichub07"
-
-        # initialize HitSpool file parameters
-        firstnum = 11
-        numfiles = 3
-
-        # create bad directory name
-        hsdir = MockHitspool.create_copy_files(category, timetag, host,
-                                               firstnum, numfiles,
-                                               real_stuff=False)
-
-        # don't check DEBUG/INFO log messages
-        self.setLogLevel(logging.WARN)
-
-        # add all expected log messages
-        self.expect_log_message("Fake Touch Error")
-        self.expect_log_message("Please put the data manually in the SPADE"
-                                " directory. Use HsSpader.py, for example.")
+        sender.move_to_destination_dir(req.hsdir, req.destdir)
 
-        # run it!
-        result = sender.spade_pickup_data(hsdir, "ignored", prefix=category)
-        self.assertIsNone(result, "spade_pickup_data() should return None,"
-                          " not %s" % str(result))
+        req.check_files()
 
         # make sure 0MQ communications checked out
         sender.validate()
 
     def test_spade_pickup_data(self):
-        sender = MySender(verbose=False)
-        self.set_sender(sender)
+        sender = self.SENDER
 
         # initialize directory parts
         category = "SNALERT"
@@ -717,27 +726,29 @@ class HsSenderTest(LoggingTestCase):
                                                firstnum, numfiles,
                                                real_stuff=True)
 
-        # set SPADE path to something which exists everywhere
-        sender.HS_SPADE_DIR = tempfile.mkdtemp(prefix="SPADE_")
+        # write SPADE files to the (RAM-backed, if possible) copy directory
+        #  which is emptied before every test
+        # (the sender is shared by all tests, so restore its SPADE directory)
+        self.addCleanup(setattr, sender, "HS_SPADE_DIR", sender.HS_SPADE_DIR)
+        sender.HS_SPADE_DIR = tempfile.mkdtemp(prefix="SPADE_",
+                                               dir=MockHitspool.COPY_DIR)
+        self.addCleanup(shutil.rmtree, sender.HS_SPADE_DIR,
+                        ignore_errors=True)
 
         mybase = "%s_%s_%s" % (category, timetag, host)
-        mytar = "HS_%s%s" % (mybase, HsSender.HsSender.TAR_SUFFIX)
-        if HsSender.HsSender.WRITE_META_XML:
-            mysem = "HS_%s%s" % (mybase, HsSender.HsSender.META_SUFFIX)
-        else:
-            mysem = "HS_%s%s" % (mybase, HsSender.HsSender.SEM_SUFFIX)
-
-        # create intermediate directory
-        movetop = tempfile.mkdtemp(prefix="Intermediate_")
+        mytar = "HS_" + mybase + TAR_SUFFIX
+        mysem = "HS_" + mybase + SPADE_SEM_SUFFIX
+
+        # create intermediate directory on the same filesystem as the
+        #  hitspool files so they can be linked rather than copied
+        movetop = tempfile.mkdtemp(prefix="Intermediate_",
+                                   dir=MockHitspool.COPY_DIR)
+        self.addCleanup(shutil.rmtree, movetop, ignore_errors=True)
         movedir = os.path.join(movetop, mybase)
         os.makedirs(movedir)
 
-        # copy hitspool files to intermediate directory
-        shutil.copytree(hsdir, os.path.join(movedir,
-                                            os.path.basename(hsdir)))
-
-        # don't check DEBUG/INFO log messages
-        self.setLogLevel(logging.WARN)
+        # link hitspool files into intermediate directory
+        link_tree(hsdir, os.path.join(movedir, os.path.basename(hsdir)))
 
         # add all expected log messages
 
@@ -783,8 +794,7 @@ class HsSenderTest(LoggingTestCase):
         sender.validate()
 
     def test_main_loop_no_msg(self):
-        sender = MySender(verbose=False)
-        self.set_sender(sender)
+        sender = self.SENDER
 
         # initialize message
         no_msg = None
@@ -792,9 +802,6 @@ class HsSenderTest(LoggingTestCase):
         # add all expected JSON messages
         sender.reporter.add_incoming(no_msg)
 
-        # don't check DEBUG/INFO log messages
-        self.setLogLevel(logging.WARN)
-
         # run it!
         if sender.mainloop():
             self.fail("Succeeded after processing no messages")
@@ -806,8 +813,7 @@ class HsSenderTest(LoggingTestCase):
         sender.validate()
 
     def test_main_loop_str_msg(self):
-        sender = MySender(verbose=False)
-        self.set_sender(sender)
+        sender = self.SENDER
 
         # initialize message
         snd_msg = json.dumps("abc")
@@ -815,9 +821,6 @@ class HsSenderTest(LoggingTestCase):
         # add all expected JSON messages
         sender.reporter.add_incoming(snd_msg)
 
-        # don't check DEBUG/INFO log messages
-        self.setLogLevel(logging.WARN)
-
         # run it!
         try:
             if sender.mainloop():
@@ -835,22 +838,16 @@ class HsSenderTest(LoggingTestCase):
         sender.validate()
 
     def test_main_loop_no_request_id(self):
-        sender = MySender(verbose=False)
-        self.set_sender(sender)
+        sender = self.SENDER
 
         # initialize message
-        rcv_msg = {
-            "msgtype": "rsync_sum",
-            "start_time": None,
-            "stop_time": None,
-        }
+        rcv_msg = BASE_RCV_MSG.copy()
+        rcv_msg["msgtype"] = "rsync_sum"
+        del rcv_msg["request_id"]
 
         # add all expected JSON messages
         sender.reporter.add_incoming(rcv_msg)
 
-        # don't check DEBUG/INFO log messages
-        self.setLogLevel(logging.WARN)
-
         # run it!
         try:
             if sender.mainloop():
@@ -867,18 +864,17 @@ class HsSenderTest(LoggingTestCase):
         sender.validate()
 
     def test_main_loop_incomplete_msg(self):
-        sender = MySender(verbose=False)
-        self.set_sender(sender)
+        sender = self.SENDER
 
         # initialize message
-        rcv_msg = {"msgtype": "rsync_sum", "request_id": "incomplete"}
+        rcv_msg = BASE_RCV_MSG.copy()
+        rcv_msg.update(msgtype="rsync_sum", request_id="incomplete")
+        del rcv_msg["start_time"]
+        del rcv_msg["stop_time"]
 
         # add all expected JSON messages
         sender.reporter.add_incoming(rcv_msg)
 
-        # don't check DEBUG/INFO log messages
-        self.setLogLevel(logging.WARN)
-
         # run it!
         try:
             if sender.mainloop():
@@ -895,32 +891,17 @@ class HsSenderTest(LoggingTestCase):
         sender.validate()
 
     def test_main_loop_unknown_msg(self):
-        sender = MySender(verbose=False)
-        self.set_sender(sender)
+        sender = self.SENDER
 
         # initialize message
-        rcv_msg = {
-            "msgtype": "xxx",
-            "request_id": None,
-            "username": None,
-            "start_time": None,
-            "stop_time": None,
-            "copy_dir": None,
-            "destination_dir": None,
-            "prefix": None,
-            "extract": None,
-            "host": None,
-            "version": None,
-        }
+        rcv_msg = BASE_RCV_MSG.copy()
+        rcv_msg["msgtype"] = "xxx"
 
         # add all expected JSON messages
         sender.reporter.add_incoming(rcv_msg)
 
-        # don't check DEBUG/INFO log messages
-        self.setLogLevel(logging.WARN)
-
         # add all expected log messages
-        self.expect_log_message(re.compile("Received bad message .*"))
+        self.expect_log_message(BAD_MSG_PAT)
 
         # run it!
         if sender.mainloop():
@@ -933,8 +914,7 @@ class HsSenderTest(LoggingTestCase):
         sender.validate()
 
     def test_main_loop_bad_hubs(self):
-        sender = MySender(verbose=False)
-        self.set_sender(sender)
+        sender = self.SENDER
 
         # initialize message
         rcv_msg = {
@@ -955,11 +935,8 @@ class HsSenderTest(LoggingTestCase):
         # add all expected JSON messages
         sender.reporter.add_incoming(rcv_msg)
 
-        # don't check DEBUG/INFO log messages
-        self.setLogLevel(logging.WARN)
-
         # add all expected log messages
-        self.expect_log_message(re.compile(r"Received bad message .*"))
+        self.expect_log_message(BAD_MSG_PAT)
 
         # run it!
         if sender.mainloop():
@@ -972,8 +949,7 @@ class HsSenderTest(LoggingTestCase):
         sender.validate()
 
     def test_main_loop_no_init_just_success(self):
-        sender = MySender(verbose=False)
-        self.set_sender(sender)
+        sender = self.SENDER
 
         # expected start/stop times
         start_ticks = 98765432100000
@@ -986,9 +962,6 @@ class HsSenderTest(LoggingTestCase):
         msgtype = HsMessage.DONE
         req.add_request(sender.reporter, msgtype)
 
-        # don't check DEBUG/INFO log messages
-        self.setLogLevel(logging.WARN)
-
         # add all expected log messages
         self.expect_log_message("Received unexpected %s message from"
                                 " %s for Req#%s (no active request)" %
@@ -1017,8 +990,7 @@ class HsSenderTest(LoggingTestCase):
         sender.validate()
 
     def test_main_loop_multi_request(self):
-        sender = MySender(verbose=False)
-        self.set_sender(sender)
+        sender = self.SENDER
 
         # expected start/stop times
         start_ticks = 98765432100000
@@ -1048,13 +1020,7 @@ class HsSenderTest(LoggingTestCase):
 
         # initialize some notification data
         notify_hdr = 'DATA REQUEST HsInterface Alert: %s' % sender.cluster
-        notify_lines = [
-            'Start: %s' % DAQTime.ticks_to_utc(start_ticks),
-            'Stop: %s' % DAQTime.ticks_to_utc(stop_ticks),
-            '(no possible leapseconds applied)',
-        ]
-        notify_pat = re.compile(r".*" + re.escape("\n".join(notify_lines)),
-                                flags=re.MULTILINE)
+        notify_pat = notify_pattern(start_ticks, stop_ticks)
 
         sender.i3socket.add_generic_email(HsConstants.ALERT_EMAIL_DEV,
                                           notify_hdr, notify_pat, prio=1)
@@ -1068,9 +1034,6 @@ class HsSenderTest(LoggingTestCase):
         req86.add_i3live_message(sender.i3socket, HsUtil.STATUS_SUCCESS,
                                  success="1,86")
 
-        # don't check DEBUG/INFO log messages
-        self.setLogLevel(logging.WARN)
-
         # run it!
         while sender.reporter.has_input:
             if not sender.mainloop():
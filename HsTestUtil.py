@@ -33,6 +33,43 @@ TICKS_PER_SECOND = 10000000000
 TIME_PAT = re.compile(r"\d+-\d+-\d+ +\d+:\d+:\d+(.\d+)?")
 # location of test-only version of RequestMonitor state database
 TEMP_STATE_DB = None
+# RAM-backed parent directory for scratch files (None if not available)
+if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+    SCRATCH_DIR = "/dev/shm"
+else:
+    SCRATCH_DIR = None
+
+
+def clear_directory(path):
+    "Remove everything inside 'path' but leave the directory itself"
+    for entry in os.listdir(path):
+        full = os.path.join(path, entry)
+        if os.path.isdir(full) and not os.path.islink(full):
+            shutil.rmtree(full)
+        else:
+            os.unlink(full)
+
+
+def link_tree(srcdir, dstdir):
+    """
+    Populate 'dstdir' with hard links to the files in 'srcdir', falling
+    back to copying files which cannot be linked
+    """
+    if not os.path.exists(dstdir):
+        os.makedirs(dstdir)
+
+    for entry in os.listdir(srcdir):
+        src = os.path.join(srcdir, entry)
+        dst = os.path.join(dstdir, entry)
+        if os.path.isdir(src):
+            link_tree(src, dst)
+            continue
+
+        try:
+            os.link(src, dst)
+        except OSError:
+            # hard links may not work across filesystems
+            shutil.copy2(src, dst)
 
 
 def create_hits(filename, start_tick, stop_tick, interval):
@@ -322,6 +359,42 @@ class CompareObjects(object):
         return xstr
 
 
+def objects_match(obj, exp):
+    """
+    Return True if `obj` matches `exp` using the same rules as
+    CompareObjects, but without building (and raising) an exception
+    for every mismatch
+    """
+    if isinstance(obj, list) and isinstance(exp, list):
+        if len(obj) != len(exp):
+            return False
+        for idx, entry in enumerate(obj):
+            if not objects_match(entry, exp[idx]):
+                return False
+        return True
+
+    if isinstance(obj, dict) and isinstance(exp, dict):
+        if len(obj) != len(exp):
+            return False
+        for key, val in obj.items():
+            if key not in exp or not objects_match(val, exp[key]):
+                return False
+        return True
+
+    if hasattr(exp, 'flags') and hasattr(exp, 'pattern'):
+        if not isinstance(obj, bytes):
+            objstr = str(obj)
+        else:
+            objstr = obj.decode("utf-8")
+        return exp.match(objstr) is not None
+
+    if isinstance(exp, unicode):
+        exp = exp.encode('ascii', 'ignore')
+    if isinstance(obj, unicode):
+        obj = obj.encode('ascii', 'ignore')
+    return isinstance(obj, type(exp)) and obj == exp
+
+
 class MockPollableSocket(object):
     @property
     def has_input(self):
@@ -337,6 +410,10 @@ class Mock0MQPoller(object):
     def add_poll_result(self, source, polltype=zmq.POLLIN):
         self.__pollresult.append([(source, polltype)])
 
+    def clear(self):
+        "Discard any unused poll results"
+        del self.__pollresult[:]
+
     def close(self):
         pass
 
@@ -414,6 +491,12 @@ class Mock0MQSocket(MockPollableSocket):
     def add_incoming(self, msg):
         self.__outqueue.append(msg)
 
+    def clear(self):
+        "Discard all queued, expected, and answer messages"
+        del self.__outqueue[:]
+        del self.__expected[:]
+        self.__answer.clear()
+
     def close(self):
         pass
 
@@ -435,8 +518,10 @@ class Mock0MQSocket(MockPollableSocket):
     def num_expected(self):
         return len(self.__expected)
 
-    def recv(self):
+    def recv(self, flags=0):
         if len(self.__outqueue) == 0:
+            if flags & zmq.NOBLOCK != 0:
+                raise zmq.Again()
             raise zmq.ZMQError("Incoming message queue is empty")
 
         msg = self.__outqueue.pop(0)
@@ -446,14 +531,18 @@ class Mock0MQSocket(MockPollableSocket):
 
         return msg
 
-    def recv_json(self):
-        return self.recv()
+    def recv_json(self, flags=0):
+        return self.recv(flags=flags)
 
     def send(self, msgstr):
-        try:
-            msgjson = json.loads(msgstr)
-        except:
+        if isinstance(msgstr, (dict, list)):
+            # already decoded, so skip the JSON round-trip
             msgjson = msgstr
+        else:
+            try:
+                msgjson = json.loads(msgstr)
+            except:
+                msgjson = msgstr
 
         return self.send_json(msgjson)
 
@@ -464,12 +553,9 @@ class Mock0MQSocket(MockPollableSocket):
 
         found = None
         for idx, expjson in enumerate(self.__expected):
-            try:
-                CompareObjects(self.__name, msgjson, expjson)
+            if objects_match(msgjson, expjson):
                 found = idx
                 break
-            except:
-                continue
 
         # if the message was unknown, throw a CompareException
         if found is None:
@@ -521,6 +607,9 @@ class MockHitspool(object):
     LOCK = threading.Lock()
     # default maximum number of hitspool files
     MAX_FILES = 1000
+    # prebuilt set of fake hitspool files which can be linked into COPY_DIR
+    TEMPLATE_DIR = None
+    TEMPLATE_RANGE = None
 
     @classmethod
     def create(cls, hsr, subdir=HsRSyncFiles.DEFAULT_SPOOL_NAME):
@@ -565,10 +654,15 @@ class MockHitspool(object):
     @classmethod
     def create_copy_files(cls, prefix, timetag, host, startnum, numfiles,
                           real_stuff=False):
-        """create copy directory and fill with fake hitspool files"""
-        cls.create_copy_dir()
-
-        # create copy directory
+        """
+        Return the path to a copy directory.  If 'real_stuff' is True,
+        create the directory and fill it with fake hitspool files,
+        otherwise nothing below COPY_DIR is touched.
+        """
+        if cls.COPY_DIR is None:
+            cls.create_copy_dir()
+
+        # build copy directory path
         path = os.path.join(cls.COPY_DIR, "%s_%s_%s" % (prefix, timetag, host))
 
         # if caller wants actual directory and files, create them
@@ -576,32 +670,53 @@ class MockHitspool(object):
             if not os.path.exists(path):
                 os.makedirs(path)
 
-            # create all fake hitspool files
-            for num in range(startnum, startnum + numfiles):
-                fpath = os.path.join(path, "HitSpool-%d" % num)
-                with open(fpath, "w") as fout:
-                    print("Fake#%d" % num, file=fout)
+            if cls.TEMPLATE_DIR is not None and \
+               cls.TEMPLATE_RANGE == (startnum, numfiles):
+                # link the prebuilt files into the new directory
+                link_tree(cls.TEMPLATE_DIR, path)
+            else:
+                cls.__write_fake_files(path, startnum, numfiles)
 
         return path
 
+    @classmethod
+    def create_template(cls, startnum, numfiles, parent=None):
+        """
+        Build a directory of fake hitspool files which will be linked
+        (rather than rewritten) by subsequent calls to create_copy_files()
+        """
+        cls.destroy_template()
+
+        cls.TEMPLATE_DIR = tempfile.mkdtemp(prefix="HsTemplate_", dir=parent)
+        cls.__write_fake_files(cls.TEMPLATE_DIR, startnum, numfiles)
+        cls.TEMPLATE_RANGE = (startnum, numfiles)
+
+    @classmethod
+    def __write_fake_files(cls, path, startnum, numfiles):
+        for num in range(startnum, startnum + numfiles):
+            fpath = os.path.join(path, "HitSpool-%d" % num)
+            with open(fpath, "w") as fout:
+                print("Fake#%d" % num, file=fout)
+
     @classmethod
     def destroy(cls):
         with cls.LOCK:
             if cls.HUB_DIR is not None:
                 # clear lingering files
-                try:
-                    shutil.rmtree(cls.HUB_DIR)
-                except:
-                    pass
+                shutil.rmtree(cls.HUB_DIR, ignore_errors=True)
                 cls.HUB_DIR = None
             if cls.COPY_DIR is not None:
                 # clear lingering files
-                try:
-                    shutil.rmtree(cls.COPY_DIR)
-                except:
-                    pass
+                shutil.rmtree(cls.COPY_DIR, ignore_errors=True)
                 cls.COPY_DIR = None
 
+    @classmethod
+    def destroy_template(cls):
+        if cls.TEMPLATE_DIR is not None:
+            shutil.rmtree(cls.TEMPLATE_DIR, ignore_errors=True)
+            cls.TEMPLATE_DIR = None
+            cls.TEMPLATE_RANGE = None
+
 
 class MockI3Socket(Mock0MQSocket):
     def __init__(self, varname, verbose=False):
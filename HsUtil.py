@@ -4,6 +4,7 @@ import datetime
 import logging
 import numbers
 import sys
+import time
 
 from collections import namedtuple
 
@@ -17,11 +18,27 @@ if sys.version_info >= (3, 0):
     # unicode isn't present in Python3
     unicode = str
 
+# string types (only one under Python3) for isinstance() checks
+STRING_TYPES = (str, ) if str is unicode else (str, unicode)
 
 # default log directory
 LOG_PATH = "/mnt/data/pdaqlocal/HsInterface/logs/"
-# dictionary of year->datetime("Jan 1 %d" % year)
-JAN1 = {}
+# cache of (Jan 1 datetime, DAQ ticks)->UTC string
+UTC_STRINGS = {}
+# maximum number of entries in UTC_STRINGS
+MAX_UTC_STRINGS = 4096
+
+# cache of (type name, field names)->namedtuple class for dict_to_object()
+OBJECT_TYPES = {}
+
+# (seconds, formatted local time) pair from the latest now_string() call
+NOW_STRING = (None, None)
+
+# constants used by get_daq_ticks()
+SECONDS_PER_DAY = 24 * 3600
+USEC_PER_SECOND = 1000000
+NS_PER_USEC = 1000
+TICKS_PER_USEC = 10000
 
 # I3Live status types
 STATUS_REQUEST_ERROR = "REQUEST ERROR"
@@ -35,24 +52,18 @@ STATUS_PARTIAL = "PARTIAL"
 def assemble_email_dict(address_list, header, message,
                         description="HsInterface Data Request",
                         prio=2, short_subject=True, quiet=True):
-    if address_list is None or len(address_list) == 0:
+    if not address_list:
         raise HsException("No addresses specified")
 
-    notifies = []
-    for email in address_list:
-        ndict = {
-            "receiver": email,
-            "notifies_txt": message,
-            "notifies_header": header,
-        }
-        notifies.append(ndict)
+    notifies = [{"receiver": email,
+                 "notifies_txt": message,
+                 "notifies_header": header} for email in address_list]
 
-    now = datetime.datetime.now()
     return {
         "service": "HSiface",
         "varname": "alert",
         "prio": prio,
-        "time": now.strftime("%Y-%m-%d %H:%M:%S"),
+        "time": now_string(),
         "value": {
             "condition": header,
             "desc": description,
@@ -66,21 +77,26 @@ def assemble_email_dict(address_list, header, message,
 def dict_to_object(xdict, expected_fields, objtype):
     """
     Convert a dictionary (which must have the expected keys) into
-    a named tuple
+    a named tuple.  `expected_fields` should be a frozenset.
     """
     if not isinstance(xdict, dict):
         raise HsException("Bad object \"%s\"<%s>" % (xdict, type(xdict)))
 
-    missing = []
-    for k in expected_fields:
-        if k not in xdict:
-            missing.append(k)
-
-    if len(missing) > 0:
+    # callers should pass a frozenset so this doesn't need to build one
+    missing = frozenset(expected_fields).difference(xdict)
+    if missing:
         raise HsException("Missing fields %s from %s" %
-                          (tuple(missing), xdict))
+                          (tuple(sorted(missing)), xdict))
+
+    # namedtuple() is expensive, so only build each type once
+    #  (key on the dictionary's own field order, since that is the order
+    #   of the namedtuple's fields and of its repr())
+    fields = tuple(xdict.keys())
+    key = (objtype, fields)
+    if key not in OBJECT_TYPES:
+        OBJECT_TYPES[key] = namedtuple(objtype, fields)
 
-    return namedtuple(objtype, list(xdict.keys()))(**xdict)
+    return OBJECT_TYPES[key](**xdict)
 
 
 def get_daq_ticks(start_time, end_time, is_ns=False):
@@ -89,16 +105,17 @@ def get_daq_ticks(start_time, end_time, is_ns=False):
     If `is_ns` is True, returned value is in nanoseconds.
     Otherwise the value is in DAQ ticks (0.1ns)
     """
+    # use integer arithmetic so large deltas don't lose precision
     if is_ns:
-        multiplier = 1E3
+        per_usec = NS_PER_USEC
     else:
-        multiplier = 1E4
+        per_usec = TICKS_PER_USEC
 
     # XXX this should use leapseconds
     delta = end_time - start_time
 
-    return int(((delta.days * 24 * 3600 + delta.seconds) * 1E6 +
-                delta.microseconds) * multiplier)
+    return ((delta.days * SECONDS_PER_DAY + delta.seconds) * USEC_PER_SECOND +
+            delta.microseconds) * per_usec
 
 
 def hub_name_to_id(hostname):
@@ -126,7 +143,7 @@ def hubs_to_string(hublist):
     Convert list of hub hostnames to a compact string of ranges
     like "1-7 9-45 48-86"
     """
-    if len(hublist) == 0:
+    if not hublist:
         return None
 
     # convert hub names to numeric values
@@ -138,7 +155,7 @@ def hubs_to_string(hublist):
             logging.error("Bad hub name \"%s\"", hub)
 
     # if we didn't find any valid names, we're done
-    if len(hub_ids) == 0:
+    if not hub_ids:
         return None
 
     # sort hub numbers
@@ -171,6 +188,32 @@ def hubs_to_string(hublist):
     return num_str
 
 
+def ticks_to_utc_string(ticks):
+    "Return the string representation of the UTC time for `ticks`"
+    # DAQ ticks are relative to the start of the year, so include it in the key
+    key = (DAQTime.jan1_by_year(), ticks)
+    if key not in UTC_STRINGS:
+        if len(UTC_STRINGS) >= MAX_UTC_STRINGS:
+            UTC_STRINGS.clear()
+        UTC_STRINGS[key] = str(DAQTime.ticks_to_utc(ticks))
+    return UTC_STRINGS[key]
+
+
+def now_string():
+    """
+    Return the current local time as a "YYYY-MM-DD HH:MM:SS" string,
+    only reformatting it when the second changes
+    """
+    global NOW_STRING
+
+    secs = int(time.time())
+    if NOW_STRING[0] != secs:
+        nowstr = datetime.datetime.fromtimestamp(secs).strftime(
+            "%Y-%m-%d %H:%M:%S")
+        NOW_STRING = (secs, nowstr)
+    return NOW_STRING[1]
+
+
 def send_live_status(i3socket, req_id, username, prefix, start_ticks,
                      stop_ticks, copydir, status, success=None,
                      failed=None):
@@ -186,7 +229,7 @@ def send_live_status(i3socket, req_id, username, prefix, start_ticks,
             raise HsException("Start time is not set")
         start_utc = ""
     elif isinstance(start_ticks, numbers.Number):
-        start_utc = DAQTime.ticks_to_utc(start_ticks)
+        start_utc = ticks_to_utc_string(start_ticks)
     else:
         raise HsException("Bad start time %s<%s>" %
                           (start_ticks, type(start_ticks).__name__))
@@ -196,7 +239,7 @@ def send_live_status(i3socket, req_id, username, prefix, start_ticks,
             raise HsException("Stop time is not set")
         stop_utc = ""
     elif isinstance(stop_ticks, numbers.Number):
-        stop_utc = DAQTime.ticks_to_utc(stop_ticks)
+        stop_utc = ticks_to_utc_string(stop_ticks)
     else:
         raise HsException("Bad stop time %s<%s>" %
                           (stop_ticks, type(stop_ticks).__name__))
@@ -207,8 +250,8 @@ def send_live_status(i3socket, req_id, username, prefix, start_ticks,
         "request_id": req_id,
         "username": username,
         "prefix": prefix,
-        "start_time": str(start_utc),
-        "stop_time": str(stop_utc),
+        "start_time": start_utc,
+        "stop_time": stop_utc,
         "destination_dir": copydir,
         "update_time": nowstr,
         "status": status,
@@ -230,12 +273,12 @@ def send_live_status(i3socket, req_id, username, prefix, start_ticks,
 
 def split_rsync_host_and_path(rsync_path):
     "Remove leading 'user@host:' from rsync path"
-    if not isinstance(rsync_path, (str, unicode)):
+    if not isinstance(rsync_path, STRING_TYPES):
         raise HsException("Illegal rsync path \"%s\"<%s>" %
                           (rsync_path, type(rsync_path)))
 
     parts = rsync_path.split(":", 1)
-    if len(parts) > 1 and parts[0].find("/") < 0:
+    if len(parts) > 1 and "/" not in parts[0]:
         return parts
 
     # either no embedded colons or colons are part of the path
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Test HsUtil functions
+"""
+
+import json
+import unittest
+
+import HsUtil
+
+
+class MockSocket(object):
+    "A mock socket which encodes messages the way pyzmq's send_json() does"
+
+    def __init__(self):
+        self.__msgs = []
+
+    def send_json(self, msg):
+        self.__msgs.append(json.dumps(msg))
+
+    @property
+    def messages(self):
+        "Return the received messages, decoded the way I3Live decodes them"
+        return [json.loads(msg) for msg in self.__msgs]
+
+
+class HsUtilTest(unittest.TestCase):
+    "Test HsUtil functions"
+
+    def test_alert(self):
+        alert = HsUtil.assemble_email_dict(["a@b.c", "x@y.z"],
+                                           "Alert <HsTest>",
+                                           "Copied to /mnt/data/hs/dir\n"
+                                           u"Took 5\u00b5s",
+                                           description="Test alert")
+
+        sock = MockSocket()
+        sock.send_json(alert)
+
+        self.assertEqual(sock.messages, [alert])
+
+    def test_dict_to_object_order(self):
+        fields = frozenset(("b", "a"))
+
+        for xdict in ({"b": 1, "a": 2, "c": 3}, {"a": 2, "c": 3, "b": 1}):
+            obj = HsUtil.dict_to_object(xdict, fields, "Thing")
+            self.assertEqual(obj._fields, tuple(xdict.keys()),
+                             "Expected fields %s, not %s" %
+                             (tuple(xdict.keys()), obj._fields))
+            self.assertEqual(obj._asdict(), xdict)
+
+    def test_live_status(self):
+        req_id = "abc123"
+        start_ticks = 157886364643994920
+        stop_ticks = 157886366643994920
+        destdir = "/mnt/data/pdaqlocal/HsDataCopy"
+
+        sock = MockSocket()
+        HsUtil.send_live_status(sock, req_id, "someone", "ANON",
+                                start_ticks, stop_ticks, destdir,
+                                HsUtil.STATUS_SUCCESS, success="1 2 3",
+                                failed="")
+
+        msgs = sock.messages
+        self.assertEqual(len(msgs), 1,
+                         "Expected 1 message, not %d" % len(msgs))
+
+        msg = msgs[0]
+        self.assertEqual(msg["service"], "hitspool")
+        self.assertEqual(msg["varname"], "hsrequest_info")
+        self.assertEqual(msg["prio"], 1)
+        self.assertEqual(msg["time"], msg["value"]["update_time"])
+
+        self.assertEqual(msg["value"], {
+            "request_id": req_id,
+            "username": "someone",
+            "prefix": "ANON",
+            "start_time": HsUtil.ticks_to_utc_string(start_ticks),
+            "stop_time": HsUtil.ticks_to_utc_string(stop_ticks),
+            "destination_dir": destdir,
+            "update_time": msg["time"],
+            "status": HsUtil.STATUS_SUCCESS,
+            "success": "1 2 3",
+            "failed": "",
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()
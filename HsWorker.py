@@ -238,6 +238,11 @@ class Worker(HsRSyncFiles):
     4. writes a short report about was has been done.
     """
 
+    # fields which must be present in a request
+    REQUEST_FIELDS = frozenset(("request_id", "username", "start_ticks",
+                                "stop_ticks", "destination_dir", "prefix",
+                                "extract"))
+
     def __init__(self, progname, host=None, fail_sleep=None, is_test=False):
         super(Worker, self).__init__(host=host, is_test=is_test)
 
@@ -370,10 +375,8 @@ class Worker(HsRSyncFiles):
         req_dict["extract"] = "extract" in req_dict and \
             req_dict["extract"] is True
 
-        alert_flds = ("request_id", "username", "start_ticks", "stop_ticks",
-                      "destination_dir", "prefix", "extract")
-
-        req = HsUtil.dict_to_object(req_dict, alert_flds, 'WorkerRequest')
+        req = HsUtil.dict_to_object(req_dict, self.REQUEST_FIELDS,
+                                    'WorkerRequest')
 
         logging.info("HsWorker queued request:\n"
                      "%s\nfrom Publisher", str(req))
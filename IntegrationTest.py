@@ -2,6 +2,7 @@
 
 from __future__ import print_function
 
+import collections
 import json
 import logging
 import os
@@ -13,6 +14,13 @@ import time
 import traceback
 import unittest
 
+import zmq
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
 import DAQTime
 import HsConstants
 import HsMessage
@@ -107,89 +115,152 @@ class MockPubSubSocket(object):
 
 
 class MockPullSocket(HsTestUtil.MockPollableSocket):
+    # queued by close() to wake up any reader
+    CLOSED = object()
+
     def __init__(self, name, verbose=False):
         self.__name = name
-        self.__queue_lock = threading.Condition()
-        self.__outqueue = []
+        self.__outqueue = queue.Queue()
         self.__exp_lock = threading.Condition()
-        self.__expected = []
+        # expected messages are bucketed by (msgtype, host) so each incoming
+        #  message is only compared against likely matches; messages
+        #  without a plain msgtype and host go in the 'unkeyed' list
+        self.__expected = {}
+        self.__unkeyed = []
+        self.__num_expected = 0
+        # guards '__closed' so only one CLOSED marker is queued and
+        #  nothing is queued after it
+        self.__close_lock = threading.Lock()
         self.__closed = False
         self.__verbose = verbose
 
     def __str__(self):
         cstr = "[CLOSED]" if self.__closed else ""
-        explen = len(self.__expected)
+        explen = self.__num_expected
         xstr = "" if explen == 0 else ", %d expected" % explen
         return "%s(%s%s%s)#%d" % \
             (type(self).__name__, self.__name, cstr, xstr,
-             len(self.__outqueue))
+             len(self.__pending()))
+
+    @classmethod
+    def __bucket_key(cls, jdict):
+        "Return the (msgtype, host) key for a message, or None"
+        if not isinstance(jdict, dict):
+            return None
+
+        key = (jdict.get("msgtype"), jdict.get("host"))
+        for val in key:
+            if val is not None and not isinstance(val, HsUtil.STRING_TYPES):
+                return None
+        return key
 
     def __check_expected(self, msgjson):
         with self.__exp_lock:
-            found = None
-            for i in range(len(self.__expected)):
-                if i >= len(self.__expected):
-                    break
-                expjson = self.__expected[i]
-                try:
-                    HsTestUtil.CompareObjects(self.__name, msgjson, expjson)
-                    found = i
-                    break
-                except:
-                    continue
+            key = self.__bucket_key(msgjson)
+            if key is not None and key in self.__expected:
+                bucket = self.__expected[key]
+                expjson = self.__pop_match(msgjson, bucket)
+                if not bucket:
+                    del self.__expected[key]
+            else:
+                expjson = None
+
+            if expjson is None:
+                expjson = self.__pop_match(msgjson, self.__unkeyed)
 
             # if the message was unknown, throw a CompareException
-            if found is None:
-                if len(self.__expected) == 0:
-                    xstr = ""
-                else:
-                    xstr = "\n\t(exp %s)" % str(self.__expected[0])
+            if expjson is None:
+                pending = [self.__unkeyed, ]
+                pending += list(self.__expected.values())
+
+                xstr = ""
+                for candidates in pending:
+                    if candidates:
+                        xstr = "\n\t(exp %s)" % str(candidates[0])
+                        break
 
                 raise HsTestUtil.CompareException("Unexpected %s(%s) message"
                                                   " (of %d): %s%s" %
                                                   (type(self).__name__,
                                                    self.__name,
-                                                   len(self.__expected),
+                                                   self.__num_expected,
                                                    msgjson, xstr))
 
-            # we received an expected message, delete it
-            expjson = self.__expected[found]
-            del self.__expected[found]
-
+            self.__num_expected -= 1
             return expjson
 
+    def __pending(self):
+        "Return a list of all queued messages"
+        with self.__outqueue.mutex:
+            return [msg for msg in self.__outqueue.queue
+                    if msg is not self.CLOSED]
+
+    def __pop_match(self, msgjson, candidates):
+        "Remove and return the first candidate which matches the message"
+        for idx, expjson in enumerate(candidates):
+            if HsTestUtil.objects_match(msgjson, expjson):
+                del candidates[idx]
+                return expjson
+
+        return None
+
     def add_expected(self, jdict):
         with self.__exp_lock:
-            self.__expected.append(jdict)
+            key = self.__bucket_key(jdict)
+            if key is None:
+                self.__unkeyed.append(jdict)
+            else:
+                if key not in self.__expected:
+                    self.__expected[key] = collections.deque()
+                self.__expected[key].append(jdict)
+            self.__num_expected += 1
 
     def close(self):
-        with self.__queue_lock:
-            self.__closed = True
-            self.__queue_lock.notifyAll()
+        with self.__close_lock:
+            if not self.__closed:
+                self.__closed = True
+                self.__outqueue.put(self.CLOSED)
 
     @property
     def has_input(self):
-        with self.__queue_lock:
-            return not self.__closed or len(self.__outqueue) > 0
+        if not self.__closed:
+            return True
+
+        # once closed, only real messages count as input
+        with self.__outqueue.mutex:
+            for msg in self.__outqueue.queue:
+                if msg is not self.CLOSED:
+                    return True
+        return False
+
+    def recv_json(self, flags=0):
+        if flags & zmq.NOBLOCK == 0:
+            msg = self.__outqueue.get()
+        else:
+            try:
+                msg = self.__outqueue.get_nowait()
+            except queue.Empty:
+                raise zmq.Again()
 
-    def recv_json(self):
-        with self.__queue_lock:
-            while True:
-                if len(self.__outqueue) > 0:
-                    return self.__outqueue.pop(0)
-                if self.__closed:
-                    break
-                self.__queue_lock.wait()
+        if msg is self.CLOSED:
+            # leave the marker for any later readers
+            self.__outqueue.put(msg)
+            return None
+        return msg
 
     def send_json(self, msgstr):
-        if len(self.__expected) == 0:
+        if self.__num_expected == 0:
             raise HsTestUtil.CompareException("Unexpected %s message: %s" %
                                               (self.__name, msgstr))
 
-        try:
-            msgjson = json.loads(msgstr)
-        except:
+        if isinstance(msgstr, dict):
+            # mock pushers forward dictionaries, so there's nothing to parse
             msgjson = msgstr
+        else:
+            try:
+                msgjson = json.loads(msgstr)
+            except:
+                msgjson = msgstr
 
         if msgjson["msgtype"] == HsMessage.WORKING:
             pass  # ignore "keepalive" messages
@@ -197,20 +268,19 @@ class MockPullSocket(HsTestUtil.MockPollableSocket):
             expjson = self.__check_expected(msgjson)
 
             if self.__verbose:
-                explen = len(self.__expected)
+                explen = self.__num_expected
                 print("%s(%s) <- %s (exp %s)" %
                       (type(self).__name__, self.__name, msgjson, expjson))
                 print("%s(%s) expect %d more message%s" %
                       (type(self).__name__, self.__name, explen,
                        "s" if explen != 1 else ""))
 
-            with self.__queue_lock:
+            with self.__close_lock:
                 if self.__closed:
                     raise Exception("Cannot send from closed %s socket" %
                                     str(self.__name))
 
-                self.__outqueue.append(msgjson)
-                self.__queue_lock.notify()
+                self.__outqueue.put(msgjson)
 
     def set_verbose(self, value=True):
         self.__verbose = value
@@ -219,24 +289,24 @@ class MockPullSocket(HsTestUtil.MockPollableSocket):
         if not self.__closed:
             raise Exception("%s<%s> was not closed" %
                             (self.__name, type(self).__name__))
-        if len(self.__outqueue) > 0:
+        pending = self.__pending()
+        if len(pending) > 0:
             raise Exception("%s<%s> queue contains %s entries (%s)" %
                             (self.__name, type(self).__name__,
-                             len(self.__outqueue), self.__outqueue))
-        with self.__queue_lock:
-            self.__queue_lock.notify()
+                             len(pending), pending))
 
 
 class MockPushPullSocket(object):
     def __init__(self, name, verbose=False):
         self.__name = name
-        self.__pushers = []
+        # map id(pusher) to pusher
+        self.__pushers = {}
         self.__puller = MockPullSocket(self.__name + "Pull", verbose=verbose)
         self.__verbose = verbose
 
     def __str__(self):
         pushstr = None
-        for psh in self.__pushers:
+        for psh in self.__pushers.values():
             if pushstr is None:
                 pushstr = ""
             else:
@@ -246,21 +316,14 @@ class MockPushPullSocket(object):
         return "%s(%s -> %s)" % (type(self).__name__, pushstr, self.__puller)
 
     def close_pusher(self, pusher):
-        found = False
-        for i in range(len(self.__pushers)):
-            if self.__pushers[i] == pusher:
-                del self.__pushers[i]
-                found = True
-                break
-
-        if not found:
+        if self.__pushers.pop(id(pusher), None) is None:
             raise Exception("Cannot find pusher %s" % str(pusher))
         if len(self.__pushers) == 0:
             self.__puller.close()
 
     def create_pusher(self, name):
         pusher = MockPushSocket(self, name, verbose=self.__verbose)
-        self.__pushers.append(pusher)
+        self.__pushers[id(pusher)] = pusher
         return pusher
 
     @property
@@ -308,12 +371,14 @@ class MockSubSocket(object):
     def __init__(self, name, verbose=False):
         self.__name = name
         self.__queue_lock = threading.Condition()
-        self.__outqueue = []
+        self.__outqueue = collections.deque()
         self.__closed = False
         self.__verbose = verbose
 
     def close(self):
-        self.__closed = True
+        with self.__queue_lock:
+            self.__closed = True
+            self.__queue_lock.notify_all()
 
     @property
     def has_input(self):
@@ -323,7 +388,7 @@ class MockSubSocket(object):
     def recv_from_pub(self, msg):
         with self.__queue_lock:
             self.__outqueue.append(msg)
-            self.__queue_lock.notify()
+            self.__queue_lock.notify_all()
 
     def recv_json(self):
         with self.__queue_lock:
@@ -331,7 +396,7 @@ class MockSubSocket(object):
                 if len(self.__outqueue) == 0:
                     self.__queue_lock.wait()
                 if len(self.__outqueue) > 0:
-                    return self.__outqueue.pop(0)
+                    return self.__outqueue.popleft()
 
     def validate(self):
         if not self.__closed:
@@ -340,10 +405,25 @@ class MockSubSocket(object):
         if len(self.__outqueue) > 0:
             raise Exception("%s<%s> queue contains %s entries (%s)" %
                             (self.__name, type(self).__name__,
-                             len(self.__outqueue), self.__outqueue))
+                             len(self.__outqueue), list(self.__outqueue)))
         with self.__queue_lock:
             self.__queue_lock.notify()
 
+    def wait_for_input(self, timeout):
+        """
+        Wait up to `timeout` seconds for a message to arrive, holding the
+        queue lock for the whole wait.  Return True if there is a queued
+        message.
+        """
+        deadline = time.time() + timeout
+        with self.__queue_lock:
+            while len(self.__outqueue) == 0 and not self.__closed:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self.__queue_lock.wait(remaining)
+            return len(self.__outqueue) > 0
+
 
 class MyPublisher(HsPublisher.Receiver):
     def __init__(self, snd_sock, verbose=False):
@@ -387,11 +467,12 @@ class MyPublisher(HsPublisher.Receiver):
     def run_test(self):
         if self.__alert_sock is None:
             raise Exception("Alert socket does not exist")
+        # all requests are queued before the test starts, so there's
+        #  no need to wait for more
         while True:
             self.reply_request()
             if not self.__alert_sock.has_input:
                 break
-            time.sleep(0.1)
         self.close_all()
 
     def validate(self):
@@ -425,12 +506,14 @@ class MySender(HsSender.HsSender):
         return self.__wrk_sock
 
     def run_test(self):
+        # the mock pull socket reports input until it's closed, so the
+        #  poller always returns it and mainloop()'s first (blocking)
+        #  recv_json() waits for the next message or for the close;
+        #  there's no need to sleep between passes
         while True:
-            if not self.mainloop():
-                pass
+            self.mainloop()
             if not self.__msg_sock.has_input:
                 break
-            time.sleep(0.1)
         self.close_all()
 
     def validate(self):
@@ -442,6 +525,9 @@ class MySender(HsSender.HsSender):
 
 
 class MyWorker(HsWorker.Worker):
+    # cache of (year, DAQ tick)->time tag string
+    TIMETAGS = {}
+
     def __init__(self, num, host, sub_sock, sender_sock):
         self.__num = num
         self.__sub_sock = sub_sock
@@ -450,6 +536,8 @@ class MyWorker(HsWorker.Worker):
         self.__sender_sock = sender_sock
 
         self.__link_paths = []
+        # directories which are known to exist
+        self.__known_dirs = set()
 
         super(MyWorker, self).__init__(self.name, host=host, fail_sleep=0.001,
                                        is_test=True)
@@ -459,7 +547,12 @@ class MyWorker(HsWorker.Worker):
 
     @classmethod
     def __timetag(cls, tick):
-        return DAQTime.ticks_to_utc(tick).strftime("%Y%m%d_%H%M%S")
+        # DAQ ticks are relative to the start of the year
+        key = (DAQTime.jan1_by_year(), tick)
+        if key not in cls.TIMETAGS:
+            utc = DAQTime.ticks_to_utc(tick)
+            cls.TIMETAGS[key] = utc.strftime("%Y%m%d_%H%M%S")
+        return cls.TIMETAGS[key]
 
     def add_expected_links(self, tick, rundir, firstnum, numfiles):
         timetag = self.__timetag(tick)
@@ -515,8 +608,10 @@ class MyWorker(HsWorker.Worker):
         # create empty file if it does not exist
         if not os.path.exists(filename):
             fdir = os.path.dirname(filename)
-            if not os.path.exists(fdir):
-                os.makedirs(fdir)
+            if fdir not in self.__known_dirs:
+                if not os.path.exists(fdir):
+                    os.makedirs(fdir)
+                self.__known_dirs.add(fdir)
             open(filename, "w").close()
 
         super(MyWorker, self).hardlink(filename, targetdir)
@@ -533,13 +628,13 @@ class MyWorker(HsWorker.Worker):
 
             # wait for more input or for this request to be processed
             for _ in range(30):
-                time.sleep(0.1)
-                if self.__sub_sock.has_input or not self.has_requests:
+                if self.__sub_sock.wait_for_input(0.1) or \
+                   not self.has_requests:
                     break
 
             # wait a bit more in case processing thread needs time to finish
-            time.sleep(0.1)
-            if not self.__sub_sock.has_input and not self.has_requests:
+            if not self.__sub_sock.wait_for_input(0.1) and \
+               not self.has_requests:
                 break
         self.close_all()
 
@@ -556,6 +651,22 @@ class IntegrationTest(LoggingTestCase):
     MATCH_ANY = re.compile(r"^.*$")
     CACHED_COPY_PATH = None
 
+    # cache of (destdir, prefix, host)->compiled copy directory pattern
+    COPY_DIR_PATTERNS = {}
+
+    @classmethod
+    def __copy_dir_pattern(cls, destdir, prefix, host):
+        """
+        Return the pattern for a host's copy directory path,
+        which substitutes wildcards for date/time
+        """
+        key = (destdir, prefix, host)
+        if key not in cls.COPY_DIR_PATTERNS:
+            cls.COPY_DIR_PATTERNS[key] = \
+                re.compile(re.escape(os.path.join(destdir, prefix)) +
+                           r"_\d+_\d+_" + re.escape(host))
+        return cls.COPY_DIR_PATTERNS[key]
+
     def __create_hsdir(self, workers, spoolname, start_ticks, stop_ticks):
         HsTestUtil.MockHitspool.create_copy_dir(workers[0])
         hspath = HsTestUtil.MockHitspool.create(workers[0], spoolname)
@@ -586,20 +697,17 @@ class IntegrationTest(LoggingTestCase):
         thrd.setDaemon(True)
         return thrd
 
-    @classmethod
-    def __delete_state(cls):
+    def __delete_state(self):
         try:
             HsTestUtil.MockHitspool.destroy()
         except:
             traceback.print_exc()
 
-        # get rid of HsSender's state database
-        dbpath = RequestMonitor.get_db_path()
-        if os.path.exists(dbpath):
-            try:
-                os.unlink(dbpath)
-            except:
-                traceback.print_exc()
+        # get rid of HsSender's state database and its directory
+        if self.__state_dir is not None:
+            shutil.rmtree(self.__state_dir, ignore_errors=True)
+            self.__state_dir = None
+        RequestMonitor.STATE_DB_PATH = self.__saved_db_path
 
     def __init_publisher(self, publisher, req_id, username, start_ticks,
                          stop_ticks, copydir):
@@ -650,15 +758,14 @@ class IntegrationTest(LoggingTestCase):
         sender.i3socket.add_generic_email(address_list, notify_hdr, notify_pat,
                                           prio=1)
 
-        status_in_progress = status_queued.copy()
-        status_in_progress["status"] = HsUtil.STATUS_IN_PROGRESS
+        status_in_progress = dict(status_queued,
+                                  status=HsUtil.STATUS_IN_PROGRESS)
         sender.i3socket.add_expected_message(status_in_progress,
                                              service="hitspool",
                                              varname="hsrequest_info",
                                              time=self.MATCH_ANY, prio=1)
 
-        status_success = status_queued.copy()
-        status_success["status"] = HsUtil.STATUS_SUCCESS
+        status_success = dict(status_queued, status=HsUtil.STATUS_SUCCESS)
         if success is not None:
             status_success["success"] = success
         sender.i3socket.add_expected_message(status_success,
@@ -683,17 +790,17 @@ class IntegrationTest(LoggingTestCase):
         }
         sender.reporter.add_expected(msg_initial)
 
+        # the reporter keeps references to these, so each one must be
+        #  a new dictionary
         for wrk in workers:
-            msg_started = msg_initial.copy()
-            msg_started["msgtype"] = HsMessage.STARTED
-            msg_started["host"] = wrk.shorthost
+            msg_started = dict(msg_initial, msgtype=HsMessage.STARTED,
+                               host=wrk.shorthost)
             sender.reporter.add_expected(msg_started)
 
-            msg_done = msg_started.copy()
-            msg_done["msgtype"] = HsMessage.DONE
-            msg_done["copy_dir"] = re.compile(os.path.join(destdir, prefix) +
-                                              r"_\d+_\d+_" +
-                                              wrk.shorthost)
+            copy_dir = self.__copy_dir_pattern(destdir, prefix,
+                                               wrk.shorthost)
+            msg_done = dict(msg_started, msgtype=HsMessage.DONE,
+                            copy_dir=copy_dir)
             sender.reporter.add_expected(msg_done)
 
     @classmethod
@@ -716,13 +823,9 @@ class IntegrationTest(LoggingTestCase):
         }
         worker.sender.add_expected(msg_started)
 
-        msg_done = msg_started.copy()
-        msg_done["msgtype"] = HsMessage.DONE
-        # build a copy directory path which
-        # substitutes wildcards for date/time
-        msg_done["copy_dir"] = re.compile(os.path.join(destdir, prefix) +
-                                          r"_\d+_\d+_" +
-                                          worker.shorthost)
+        copy_dir = cls.__copy_dir_pattern(destdir, prefix, worker.shorthost)
+        msg_done = dict(msg_started, msgtype=HsMessage.DONE,
+                        copy_dir=copy_dir)
         worker.sender.add_expected(msg_done)
 
         # build timetag used to construct final destination
@@ -743,13 +846,14 @@ class IntegrationTest(LoggingTestCase):
         # by default, don't check DEBUG/INFO log messages
         self.setLogLevel(logging.WARN)
 
-        # point the RequestMonitor at a temporary state file for tests
-        HsTestUtil.set_state_db_path()
+        # give each test a fresh RequestMonitor state database
+        self.__state_dir = tempfile.mkdtemp(prefix="hsstate")
+        self.__saved_db_path = RequestMonitor.STATE_DB_PATH
+        RequestMonitor.STATE_DB_PATH = os.path.join(self.__state_dir,
+                                                    "state.db")
 
         self.set_copy_path()
 
-        self.__delete_state()
-
         DumpThreadsOnSignal()
 
     def tearDown(self):
@@ -828,18 +932,13 @@ class IntegrationTest(LoggingTestCase):
         for thrd in reversed(thrds):
             thrd.start()
 
-        # wait for threads to finish
-        for _ in range(25):
-            alive = False
-            for thrd in thrds:
-                if thrd.is_alive():
-                    thrd.join(1)
-                    if thrd.is_alive():
-                        alive = True
-                        break
-            if not alive:
+        # wait (up to 25 seconds in total) for threads to finish
+        deadline = time.time() + 25.0
+        for thrd in thrds:
+            remaining = deadline - time.time()
+            if remaining <= 0:
                 break
-            time.sleep(0.1)
+            thrd.join(remaining)
 
         # validate services
         progs = [publisher, ]
@@ -36,6 +36,16 @@ class LoggingTestCase(TestCase):
         super(LoggingTestCase, cls).setUpClass()
         cls.__init_handler()
 
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            # don't let this class's handler see other classes' messages
+            if cls._my_log_handler is not None:
+                logging.getLogger().removeHandler(cls._my_log_handler)
+                cls._my_log_handler = None
+        finally:
+            super(LoggingTestCase, cls).tearDownClass()
+
     def setUp(self):
         if self._my_log_handler is None:
             self.__init_handler()
@@ -10,6 +10,7 @@ import numbers
 import os
 import sqlite3
 import threading
+import time
 
 import DAQTime
 import HsConstants
@@ -33,6 +34,8 @@ class RequestMonitor(threading.Thread):
     # number of seconds a request can be "idle" before it's closed and
     # declared incomplete
     EXPIRE_SECONDS = 3600.0
+    # queued by flush_state() so the thread forgets all requests
+    FLUSH_MARKER = object()
 
     # database request phases
     DBPHASE_INITIAL = 0
@@ -43,9 +46,24 @@ class RequestMonitor(threading.Thread):
     DBPHASE_IGNORED = 90
     DBPHASE_ERROR = 99
 
+    # body of the email sent when a request is started
+    ALERT_FORMAT = "Start: %s\nStop: %s\n(no possible leapseconds applied)"
+    # header of the email sent when a request is started
+    ALERT_HEADER_FORMAT = "DATA REQUEST HsInterface Alert: %s"
+    # recipients of the email sent when an SNALERT request is started
+    ALERT_EMAIL_SNALERT = HsConstants.ALERT_EMAIL_DEV + \
+        HsConstants.ALERT_EMAIL_SN
+
+    # message types which mean a host has finished with a request
+    COMPLETED_MSGTYPES = frozenset((HsMessage.IGNORED, HsMessage.DONE,
+                                    HsMessage.FAILED))
+
     def __init__(self, sender):
         self.__sender = sender
 
+        # alert email header (the cluster never changes, so build it once)
+        self.__alert_header = None
+
         # SQLite connection
         self.__sqlconn = None
 
@@ -57,32 +75,46 @@ class RequestMonitor(threading.Thread):
         # thread-related attributes
         self.__stopping = False
         self.__running = False
+        self.__started = threading.Event()
+        self.__busy = False
         self.__msgqueue = []
         self.__msglock = threading.Condition()
 
+        # map message types to their handlers
+        #  (completed requests are handled separately since they also
+        #   need the 'force_spade' flag)
+        self.__msg_handlers = {
+            HsMessage.INITIAL: self.__handle_req_initial,
+            HsMessage.STARTED: self.__handle_req_started,
+            HsMessage.WORKING: self.__handle_req_working,
+            HsMessage.DELETE: self.__handle_req_delete,
+        }
+
         super(RequestMonitor, self).__init__(target=self.__run)
 
     def __build_json_email(self, start_ticks, stop_ticks, prefix, extract):
-        alertmsg = "Start: %s\nStop: %s\n(no possible leapseconds applied)" % \
-                   (DAQTime.ticks_to_utc(start_ticks),
-                    DAQTime.ticks_to_utc(stop_ticks))
+        alertmsg = self.ALERT_FORMAT % \
+                   (HsUtil.ticks_to_utc_string(start_ticks),
+                    HsUtil.ticks_to_utc_string(stop_ticks))
         if extract:
             alertmsg += "\nExtracting matching hits"
 
-        notify_hdr = "DATA REQUEST HsInterface Alert: %s" % \
-                     str(self.__sender.cluster)
+        if self.__alert_header is None:
+            self.__alert_header = self.ALERT_HEADER_FORMAT % \
+                                  str(self.__sender.cluster)
 
-        # build list of recipients
-        address_list = HsConstants.ALERT_EMAIL_DEV[:]
+        # choose the list of recipients
         if prefix == HsPrefix.SNALERT:
-            address_list += HsConstants.ALERT_EMAIL_SN
+            address_list = self.ALERT_EMAIL_SNALERT
+        else:
+            address_list = HsConstants.ALERT_EMAIL_DEV
 
         # if we found one or more recipients, send an alert email
         if len(address_list) == 0:
             return None
 
-        return HsUtil.assemble_email_dict(address_list, notify_hdr, alertmsg,
-                                          prio=1)
+        return HsUtil.assemble_email_dict(address_list, self.__alert_header,
+                                          alertmsg, prio=1)
 
     def __check_if_active(self, msg):
         "If this message is not for the active request, log an error"
@@ -198,6 +230,19 @@ class RequestMonitor(threading.Thread):
                                 prefix, start_ticks, stop_ticks, dest_dir,
                                 status, success=success, failed=failed)
 
+    def __flush_requests(self):
+        "Forget all cached requests and empty the state database tables"
+        with self.__reqlock:
+            self.__requests.clear()
+            self.__active = None
+
+        if self.__sqlconn is None:
+            self.__sqlconn = self.__open_database()
+        with self.__sqlconn:
+            cursor = self.__sqlconn.cursor()
+            cursor.execute("delete from requests")
+            cursor.execute("delete from request_details")
+
     def __get_request_status(self, req_id):
         """
         Return lists of all hosts which have finished the specified request
@@ -230,17 +275,10 @@ class RequestMonitor(threading.Thread):
         return (HsUtil.hubs_to_string(success), HsUtil.hubs_to_string(failed))
 
     def __handle_msg(self, msg, force_spade):
-        if msg.msgtype == HsMessage.INITIAL:
-            self.__handle_req_initial(msg)
-        elif msg.msgtype == HsMessage.STARTED:
-            self.__handle_req_started(msg)
-        elif msg.msgtype == HsMessage.WORKING:
-            self.__handle_req_working(msg)
-        elif msg.msgtype == HsMessage.DELETE:
-            self.__handle_req_delete(msg)
-        elif (msg.msgtype == HsMessage.IGNORED or
-              msg.msgtype == HsMessage.DONE or
-              msg.msgtype == HsMessage.FAILED):
+        handler = self.__msg_handlers.get(msg.msgtype)
+        if handler is not None:
+            handler(msg)
+        elif msg.msgtype in self.COMPLETED_MSGTYPES:
             self.__handle_req_completed(msg, force_spade=force_spade)
         else:
             logging.error("Not handling message type \"%s\" in \"%s\"",
@@ -652,6 +690,7 @@ class RequestMonitor(threading.Thread):
 
         # ready to start running!
         self.__running = True
+        self.__started.set()
 
         # loop until stopped
         while not self.__stopping:
@@ -673,8 +712,11 @@ class RequestMonitor(threading.Thread):
                         msg, force_spade = None, False
                     else:
                         msg, force_spade = self.__msgqueue.pop(0)
+                        self.__busy = True
 
-                if msg is not None:
+                if msg is self.FLUSH_MARKER:
+                    self.__flush_requests()
+                elif msg is not None:
                     self.__handle_msg(msg, force_spade)
 
                 # expire overdue requests
@@ -682,8 +724,14 @@ class RequestMonitor(threading.Thread):
             except:
                 logging.exception("RequestMonitor exception")
 
+            # let wait_for_idle() callers recheck the state
+            with self.__msglock:
+                self.__busy = False
+                self.__msglock.notify_all()
+
         self.__close_database()
         self.__running = False
+        self.__started.clear()
         self.__stopping = False
 
     def __start_next_request(self):
@@ -765,10 +813,8 @@ class RequestMonitor(threading.Thread):
                             (type(msg).__name__, msg))
 
         # validate message type
-        if msg.msgtype not in (HsMessage.INITIAL, HsMessage.STARTED,
-                               HsMessage.WORKING, HsMessage.IGNORED,
-                               HsMessage.DONE, HsMessage.FAILED,
-                               HsMessage.DELETE):
+        if msg.msgtype not in self.__msg_handlers and \
+           msg.msgtype not in self.COMPLETED_MSGTYPES:
             raise ValueError("Unknown message type \"%s\" in \"%s\"" %
                              (msg.msgtype, msg))
 
@@ -783,7 +829,21 @@ class RequestMonitor(threading.Thread):
 
         with self.__msglock:
             self.__msgqueue.append((msg, force_spade))
-            self.__msglock.notify()
+            self.__msglock.notify_all()
+
+    def flush_state(self, timeout=None):
+        """
+        Drop all queued messages and ask the thread to forget all requests,
+        then wait for it to finish.  Return False if that didn't happen in
+        time.  (Only used by unit tests)
+        """
+        with self.__msglock:
+            # the thread owns the database connection, so it does the work
+            #  after finishing any message it's already handling
+            self.__msgqueue[:] = [(self.FLUSH_MARKER, False)]
+            self.__msglock.notify_all()
+
+        return self.wait_for_idle(timeout)
 
     @classmethod
     def get_db_path(cls):
@@ -805,7 +865,7 @@ class RequestMonitor(threading.Thread):
         with self.__msglock:
             mlen = 0 if self.__msgqueue is None else len(self.__msgqueue)
             rlen = 0 if self.__requests is None else len(self.__requests)
-            return mlen == 0 and rlen == 0
+            return mlen == 0 and rlen == 0 and not self.__busy
 
     @property
     def is_started(self):
@@ -845,4 +905,30 @@ class RequestMonitor(threading.Thread):
     def stop(self):
         with self.__msglock:
             self.__stopping = True
-            self.__msglock.notify()
+            self.__msglock.notify_all()
+
+    def wait_for_idle(self, timeout=None):
+        """
+        Wait until all queued messages have been handled and there are no
+        active requests.  Return False if that didn't happen in time.
+        (Only used by unit tests, via HsSender.wait_for_idle())
+        """
+        if timeout is not None:
+            deadline = time.time() + timeout
+        with self.__msglock:
+            while not self.is_idle:
+                if timeout is None:
+                    self.__msglock.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+                    self.__msglock.wait(remaining)
+            return True
+
+    def wait_for_start(self, timeout=None):
+        """
+        Wait until the thread has loaded the state database and is ready
+        to handle messages.  Return False if it did not start in time.
+        """
+        return self.__started.wait(timeout)
@@ -28,6 +28,9 @@ class Comparable(object):
     and this class will automatically populate the special comparison and
     hash functions
     """
+    # don't force a per-instance dict on subclasses which use __slots__
+    __slots__ = ()
+
     def __eq__(self, other):
         if other is None:
             return False
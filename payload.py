@@ -10,18 +10,74 @@ from __future__ import print_function
 
 import argparse
 import bz2
-import gzip
+import io
+import multiprocessing
 import numbers
 import os
+import shutil
 import struct
-
-try:
-    from cStringIO import StringIO
-except:  # ModuleNotFoundError only works under 2.7/3.0
-    from io import StringIO
+import sys
+import tempfile
 
 from i3helper import Comparable
 
+# use the much faster ISA-L gzip decompressor if it's available
+try:
+    from isal import igzip as gzip
+except ImportError:
+    import gzip
+
+# Python 2 byte strings index to 1-character strings rather than integers
+PY2_BYTES = bytes is str
+
+# precompiled formats for fixed-size fields, so they're only parsed once
+UINT32_STRUCT = struct.Struct(">I")
+ENVELOPE_STRUCT = struct.Struct(">2IQ")
+READ_ENVELOPE_STRUCT = struct.Struct(">iiq")
+SIMPLE_HIT_STRUCT = struct.Struct(">IIQIIIQH")
+SIMPLE_HIT_DATA_STRUCT = struct.Struct(">3iqh")
+SIMPLE_HIT_OUT_STRUCT = struct.Struct(">2iq3iqh")
+DELTA_HEADER_STRUCTS = {
+    False: struct.Struct(">8xQ3HQ"),
+    True: struct.Struct("<8xQ3HQ"),
+}
+DELTA_WORDS_STRUCTS = {
+    False: struct.Struct(">2I"),
+    True: struct.Struct("<2I"),
+}
+DELTA_COLUMNS_STRUCT = struct.Struct(">8xQ3HQ2I")
+EVENT_HEADER_STRUCT = struct.Struct(">IHIII")
+HIT_RECORD_STRUCT = struct.Struct(">HBBHI")
+TRIGGER_RECORD_STRUCT = struct.Struct(">6i")
+MONITOR_HEADER_STRUCT = struct.Struct(">Qhh6B")
+UINT64_STRUCT = struct.Struct(">Q")
+TCAL_STRUCT = struct.Struct("<HHQQ128xQQ128xB12sc")
+
+# names of component types which have numbered instances
+NUMBERED_COMPONENTS = {
+    3: "icetopHandler",
+    12: "stringHub",
+    13: "simHub",
+}
+
+# names of component types which only have a single instance
+SINGLE_COMPONENTS = {
+    4: "inIceTrigger",
+    5: "iceTopTrigger",
+    6: "globalTrigger",
+    7: "eventBuilder",
+    8: "tcalBuilder",
+    9: "moniBuilder",
+    10: "amandaTrigger",
+    11: "snBuilder",
+    14: "secondaryBuilders",
+    15: "trackEngine",
+}
+
+# cache of source ID -> human-readable name
+SOURCE_NAMES = {}
+MAX_SOURCE_NAMES = 1000
+
 
 class PayloadException(Exception):
     "Payload exception"
@@ -33,7 +89,7 @@ class StopMessage(object):
     @property
     def bytes(self):
         "Return the binary representation of this payload"
-        return struct.pack(">I", 4)
+        return UINT32_STRUCT.pack(4)
 
 
 class Payload(Comparable):
@@ -41,6 +97,9 @@ class Payload(Comparable):
     TYPE_ID = None
     ENVELOPE_LENGTH = 16
 
+    # payloads are created by the million, so don't give each one a dict
+    __slots__ = ("__utime", "__data", "__valid_data")
+
     def __init__(self, utime, data, keep_data=True):
         "Payload time and non-envelope data bytes"
         self.__utime = utime
@@ -77,11 +136,16 @@ class Payload(Comparable):
             raise PayloadException("Data was discarded; cannot return length")
         return len(self.__data)
 
+    def discard_data(self):
+        "Drop the raw data bytes, keeping only the parsed header fields"
+        self.__data = None
+        self.__valid_data = False
+
     @property
     def envelope(self):
         "Return the envelope bytes"
-        return struct.pack(">2IQ", self.data_length + self.ENVELOPE_LENGTH,
-                           self.payload_type_id(), self.__utime)
+        return ENVELOPE_STRUCT.pack(self.data_length + self.ENVELOPE_LENGTH,
+                                    self.payload_type_id(), self.__utime)
 
     @classmethod
     def extract_clock_bytes(cls, rawval):
@@ -117,44 +181,28 @@ class Payload(Comparable):
     @staticmethod
     def source_name(src_id):
         "Translate the source ID into a human-readable string"
+        if src_id in SOURCE_NAMES:
+            return SOURCE_NAMES[src_id]
+
         comp_type = int(src_id / 1000)
         comp_num = src_id % 1000
 
-        if comp_type == 3:
-            comp_name = "icetopHandler-%d" % comp_num
-        elif comp_type == 12:
-            comp_name = "stringHub-%d" % comp_num
-        elif comp_type == 13:
-            comp_name = "simHub-%d" % comp_num
+        if comp_type in NUMBERED_COMPONENTS:
+            comp_name = "%s-%d" % (NUMBERED_COMPONENTS[comp_type], comp_num)
         else:
             if comp_num != 0:
                 raise PayloadException("Unexpected component#%d for"
                                        " source#%d" %
                                        (comp_num, comp_type * 1000))
 
-            if comp_type == 4:
-                comp_name = "inIceTrigger"
-            elif comp_type == 5:
-                comp_name = "iceTopTrigger"
-            elif comp_type == 6:
-                comp_name = "globalTrigger"
-            elif comp_type == 7:
-                comp_name = "eventBuilder"
-            elif comp_type == 8:
-                comp_name = "tcalBuilder"
-            elif comp_type == 9:
-                comp_name = "moniBuilder"
-            elif comp_type == 10:
-                comp_name = "amandaTrigger"
-            elif comp_type == 11:
-                comp_name = "snBuilder"
-            elif comp_type == 14:
-                comp_name = "secondaryBuilders"
-            elif comp_type == 15:
-                comp_name = "trackEngine"
+            if comp_type in SINGLE_COMPONENTS:
+                comp_name = SINGLE_COMPONENTS[comp_type]
             else:
                 comp_name = "??component#%d??" % (comp_type, )
 
+        if len(SOURCE_NAMES) >= MAX_SOURCE_NAMES:
+            SOURCE_NAMES.clear()
+        SOURCE_NAMES[src_id] = comp_name
         return comp_name
 
     @property
@@ -201,7 +249,7 @@ class SimpleHit(Payload):
         if data_or_trig_type is not None and \
            (cfg_id is None or src_id is None or mbid is None):
             # assume 'trig_type' is actually binary data
-            flds = struct.unpack(">3iqh", data_or_trig_type)
+            flds = SIMPLE_HIT_DATA_STRUCT.unpack(data_or_trig_type)
             self.__trig_type = flds[0]
             self.__cfg_id = flds[1]
             self.__src_id = flds[2]
@@ -233,9 +281,10 @@ class SimpleHit(Payload):
         if self.has_data:
             return super(SimpleHit, self).bytes
 
-        return struct.pack(">IIQIIIQH", self.MIN_LENGTH, self.TYPE_ID,
-                           self.utime, self.__trig_type, self.__cfg_id,
-                           self.__src_id, self.__mbid, self.__trig_type)
+        return SIMPLE_HIT_STRUCT.pack(self.MIN_LENGTH, self.TYPE_ID,
+                                      self.utime, self.__trig_type,
+                                      self.__cfg_id, self.__src_id,
+                                      self.__mbid, self.__trig_type)
 
     @property
     def config_id(self):
@@ -258,47 +307,121 @@ class SimpleHit(Payload):
         return self.__trig_type
 
 
+def build_delta_words(bpw):
+    """
+    Return a table mapping each raw `bpw`-bit word to its signed delta,
+    with None marking the escape code which switches to wider words
+    """
+    half = 1 << (bpw - 1)
+    words = []
+    for val in range(1 << bpw):
+        if val == half:
+            words.append(None)
+        elif val > half:
+            words.append(val - (1 << bpw))
+        else:
+            words.append(val)
+    return tuple(words)
+
+
+# decoded words for each of the delta compression word sizes
+DELTA_WORDS = dict((bpw, build_delta_words(bpw)) for bpw in (1, 2, 3, 6, 11))
+
+# (bits per word, threshold) reached by shifting up/down from each word size
+SHIFT_UP = {1: (2, 1), 2: (3, 2), 3: (6, 4), 6: (11, 32)}
+SHIFT_DOWN = {2: (1, 0), 3: (2, 1), 6: (3, 2), 11: (6, 4)}
+
+# full decoder state (bpw, bth, word table, mask) after each shift
+DECODE_UP = dict((bpw, (nbpw, nbth, DELTA_WORDS[nbpw], (1 << nbpw) - 1))
+                 for bpw, (nbpw, nbth) in SHIFT_UP.items())
+DECODE_DOWN = dict((bpw, (nbpw, nbth, DELTA_WORDS[nbpw], (1 << nbpw) - 1))
+                   for bpw, (nbpw, nbth) in SHIFT_DOWN.items())
+
+
 # pylint: disable=invalid-name
 # This is an internal class
 class delta_codec(object):
     """
     Delta compression decoder (stolen from icecube.daq.slchit in pDAQ's PyDOM)
     """
-    def __init__(self, buf):
-        "Load the buffer and prepare to decode"
-        self.tape = StringIO(buf)
+    def __init__(self, buf, offset=0):
+        """
+        Load the buffer and prepare to decode, starting `offset` bytes
+        into the buffer so callers needn't copy a slice
+        """
+        if PY2_BYTES and not isinstance(buf, bytearray):
+            self.buf = bytearray(buf)
+        else:
+            self.buf = buf
+        self.pos = offset
         self.valid_bits = 0
         self.register = 0
         self.bpw = None
         self.bth = None
 
     def decode(self, length):
-        "Decode the specified number of bytes"
-        self.bpw = 3
-        self.bth = 2
+        "Decode the specified number of samples"
+        # this is the hot path, so keep the bit reader state in locals
+        #  and inline get_bits(), shift_up() and shift_down()
+        buf = self.buf
+        pos = self.pos
+        register = self.register
+        valid_bits = self.valid_bits
+        bpw = 3
+        bth = 2
+        words = DELTA_WORDS[bpw]
+        mask = (1 << bpw) - 1
         last = 0
-        out = []
-        for _ in range(length):
-            while True:
-                wrd = self.get_bits()
-                # print("%d: Got %d" % (i, wrd))
-                if wrd != (1 << (self.bpw - 1)):
-                    break
-                self.shift_up()
-            if abs(wrd) < self.bth:
-                self.shift_down()
-            last += wrd
-            # print("out %s" % last)
-            out.append(last)
+        out = [0] * length
+        try:
+            for idx in range(length):
+                while True:
+                    while valid_bits < bpw:
+                        register |= buf[pos] << valid_bits
+                        pos += 1
+                        valid_bits += 8
+                    wrd = words[register & mask]
+                    register >>= bpw
+                    valid_bits -= bpw
+                    if wrd is not None:
+                        break
+
+                    bpw, bth, words, mask = DECODE_UP[bpw]
+
+                if abs(wrd) < bth:
+                    bpw, bth, words, mask = DECODE_DOWN[bpw]
+
+                last += wrd
+                out[idx] = last
+        except IndexError:
+            raise PayloadException("Ran out of delta-compressed data")
+        except KeyError:
+            raise ValueError("Bad BPW value %d" % bpw)
+
+        self.pos = pos
+        self.register = register
+        self.valid_bits = valid_bits
+        self.bpw = bpw
+        self.bth = bth
         return out
 
     def get_bits(self):
-        "Decode the next byte"
-        while self.valid_bits < self.bpw:
-            next_byte, = struct.unpack('B', self.tape.read(1))
-            # print("Read %s" % (next_byte, ))
-            self.register |= (next_byte << self.valid_bits)
-            self.valid_bits += 8
+        "Decode the next word"
+        if self.valid_bits < self.bpw:
+            buf = self.buf
+            pos = self.pos
+            register = self.register
+            valid_bits = self.valid_bits
+            while valid_bits < self.bpw:
+                if pos >= len(buf):
+                    raise PayloadException("Ran out of delta-compressed"
+                                           " data")
+                register |= buf[pos] << valid_bits
+                pos += 1
+                valid_bits += 8
+            self.pos = pos
+            self.register = register
+            self.valid_bits = valid_bits
         # print("Bit register: %s" % bitstring(self.register, self.valid_bits))
         val = self.register & ((1 << self.bpw) - 1)
         if val > (1 << (self.bpw - 1)):
@@ -309,53 +432,32 @@ class delta_codec(object):
 
     def shift_up(self):
         "Shift up"
-        if self.bpw == 1:
-            self.bpw = 2
-            self.bth = 1
-        elif self.bpw == 2:
-            self.bpw = 3
-            self.bth = 2
-        elif self.bpw == 3:
-            self.bpw = 6
-            self.bth = 4
-        elif self.bpw == 6:
-            self.bpw = 11
-            self.bth = 32
-        else:
+        if self.bpw not in SHIFT_UP:
             raise ValueError("Bad BPW value %d" % self.bpw)
-        # print("Shifted up to %s %s" % (self.bpw, self.bth)
+        self.bpw, self.bth = SHIFT_UP[self.bpw]
 
     def shift_down(self):
         "Shift down"
-        if self.bpw == 2:
-            self.bpw = 1
-            self.bth = 0
-        elif self.bpw == 3:
-            self.bpw = 2
-            self.bth = 1
-        elif self.bpw == 6:
-            self.bpw = 3
-            self.bth = 2
-        elif self.bpw == 11:
-            self.bpw = 6
-            self.bth = 4
-        else:
+        if self.bpw not in SHIFT_DOWN:
             raise ValueError("Bad BPW value %d" % self.bpw)
-        # print("Shifted down to %s %s" % (self.bpw, self.bth))
+        self.bpw, self.bth = SHIFT_DOWN[self.bpw]
 
 
 class HitPayload(Payload):
     "Superclass for all hit payloads"
 
+    __slots__ = ()
+
     def __init__(self, utime, data, keep_data=True):
         super(HitPayload, self).__init__(utime, data, keep_data=keep_data)
 
     @property
     def simple_hit(self):
         "Return the simplified version of this hit"
-        return struct.pack(">2iq3iqh", 38, self.payload_type_id(), self.utime,
-                           self.trigger_type, self.config_id, self.source_id,
-                           self.mbid, self.trigger_mode)
+        return SIMPLE_HIT_OUT_STRUCT.pack(38, self.payload_type_id(),
+                                          self.utime, self.trigger_type,
+                                          self.config_id, self.source_id,
+                                          self.mbid, self.trigger_mode)
 
     @property
     def config_id(self):
@@ -391,6 +493,10 @@ class DeltaCompressedHit(HitPayload):
     TYPE_ID = 3
     MIN_LENGTH = 54 - Payload.ENVELOPE_LENGTH
 
+    __slots__ = ("__mbid", "__version", "__pedestal", "__domclk", "__word0",
+                 "__word2", "__has_fadc", "__has_atwd", "__atwd_channels",
+                 "__decoded", "__fadc", "__atwd")
+
     def __init__(self, mbid, data, keep_data=True, little_endian=False):
         """
         Extract delta-compressed hit data from the buffer
@@ -399,12 +505,9 @@ class DeltaCompressedHit(HitPayload):
             raise PayloadException("Expected at least %d data bytes, got %d" %
                                    (self.MIN_LENGTH, len(data)))
 
-        if little_endian:
-            order = "<"
-        else:
-            order = ">"
+        little_endian = bool(little_endian)
 
-        hdr = struct.unpack("%s8xQ3HQ" % order, data[:30])
+        hdr = DELTA_HEADER_STRUCTS[little_endian].unpack_from(data, 0)
 
         if hdr[1] != 1:
             raise PayloadException(("Bad order-check %d for DeltaSenderHit "
@@ -417,7 +520,13 @@ class DeltaCompressedHit(HitPayload):
         self.__version = hdr[2]
         self.__pedestal = hdr[3]
         self.__domclk = hdr[4]
-        self.__word0, self.__word2 = struct.unpack("%s2I" % order, data[30:38])
+        self.__word0, self.__word2 = \
+            DELTA_WORDS_STRUCTS[little_endian].unpack_from(data, 30)
+
+        # waveform accessors check these on every call, so extract them once
+        self.__has_fadc = self.__word0 & 0x8000 != 0
+        self.__has_atwd = self.__word0 & 0x4000 != 0
+        self.__atwd_channels = (self.__word0 & 0x3000) >> 12
 
         self.__decoded = False
         self.__fadc = None
@@ -433,14 +542,14 @@ class DeltaCompressedHit(HitPayload):
         if self.__decoded:
             return
 
-        codec = delta_codec(self.data_bytes[38:])
+        codec = delta_codec(self.data_bytes, offset=38)
 
-        if self.has_fadc:
+        if self.__has_fadc:
             self.__fadc = codec.decode(256)
 
-        if self.has_atwd:
+        if self.__has_atwd:
             self.__atwd = []
-            for _ in range(self.atwd_channels + 1):
+            for _ in range(self.__atwd_channels + 1):
                 self.__atwd.append(codec.decode(128))
 
         self.__decoded = True
@@ -454,7 +563,7 @@ class DeltaCompressedHit(HitPayload):
         """
         ATWD values (note that these are in time-reversed order)
         """
-        if not self.has_atwd:
+        if not self.__has_atwd:
             raise PayloadException("No available ATWD channels")
 
         if not self.__decoded:
@@ -465,7 +574,7 @@ class DeltaCompressedHit(HitPayload):
     @property
     def atwd_channels(self):
         "Number of ATWD channels"
-        return (self.__word0 & 0x3000) >> 12
+        return self.__atwd_channels
 
     @property
     def atwd_chip(self):
@@ -497,13 +606,13 @@ class DeltaCompressedHit(HitPayload):
 
     @property
     def envelope(self):
-        return struct.pack(">2IQ", self.data_length + self.ENVELOPE_LENGTH,
-                           self.payload_type_id(), self.__mbid)
+        return ENVELOPE_STRUCT.pack(self.data_length + self.ENVELOPE_LENGTH,
+                                    self.payload_type_id(), self.__mbid)
 
     @property
     def fadc(self):
         "fADC values"
-        if not self.has_fadc:
+        if not self.__has_fadc:
             raise PayloadException("No available fADC")
 
         if not self.__decoded:
@@ -514,12 +623,12 @@ class DeltaCompressedHit(HitPayload):
     @property
     def has_atwd(self):
         "Does the hit have ATWD?"
-        return self.__word0 & 0x4000 != 0
+        return self.__has_atwd
 
     @property
     def has_fadc(self):
         "Does the hit have fADC?"
-        return self.__word0 & 0x8000 != 0
+        return self.__has_fadc
 
     @property
     def hit_size(self):
@@ -592,6 +701,9 @@ class EventV5(Payload):
     TYPE_ID = 21
     MIN_LENGTH = 18
 
+    __slots__ = ("__stop_time", "__year", "__uid", "__run", "__subrun",
+                 "__hit_records", "__trig_records")
+
     def __init__(self, utime, data, keep_data=True):
         """
         Extract V5 event data from the buffer
@@ -602,7 +714,7 @@ class EventV5(Payload):
 
         super(EventV5, self).__init__(utime, data, keep_data=keep_data)
 
-        hdr = struct.unpack(">IHIII", data[:18])
+        hdr = EVENT_HEADER_STRUCT.unpack_from(data, 0)
 
         self.__stop_time = utime + hdr[0]
         self.__year = hdr[1]
@@ -611,8 +723,8 @@ class EventV5(Payload):
         self.__subrun = hdr[4]
 
         offset = 18
-        self.__hit_records, offset = self.__load_hit_records(utime, data,
-                                                             offset)
+        self.__hit_records, offset = \
+            self.__load_hit_records(utime, data, offset, keep_data)
         self.__trig_records, offset = self.__load_trig_records(utime, data,
                                                                offset)
 
@@ -624,27 +736,28 @@ class EventV5(Payload):
              self.run, len(self.__hit_records), len(self.__trig_records))
 
     @staticmethod
-    def __load_hit_records(base_time, data, offset):
+    def __load_hit_records(base_time, data, offset, keep_data):
         "Return all the hit records"
 
         # extract the number of hit records
-        num_recs = struct.unpack(">I", data[offset:offset+4])[0]
+        num_recs = UINT32_STRUCT.unpack_from(data, offset)[0]
         offset += 4
 
+        # bind everything used by the loop to locals
+        hdrlen = BaseHitRecord.HEADER_LEN
+        unpack_from = HIT_RECORD_STRUCT.unpack_from
+        rec_classes = HIT_RECORD_CLASSES
+
         recs = []
         for _ in range(num_recs):
-            hdrdata = data[offset:offset+BaseHitRecord.HEADER_LEN]
-            rechdr = struct.unpack(">HBBHI", hdrdata)
-            if rechdr[1] == EngineeringHitRecord.TYPE_ID:
-                rec = EngineeringHitRecord(base_time, rechdr, data,
-                                           offset + BaseHitRecord.HEADER_LEN)
-            elif rechdr[1] == DeltaHitRecord.TYPE_ID:
-                rec = DeltaHitRecord(base_time, rechdr, data,
-                                     offset + BaseHitRecord.HEADER_LEN)
-            else:
+            rechdr = unpack_from(data, offset)
+            if rechdr[1] not in rec_classes:
                 raise PayloadException("Unknown hit record type #%d" %
                                        rechdr[1])
 
+            rec = rec_classes[rechdr[1]](base_time, rechdr, data,
+                                         offset + hdrlen,
+                                         keep_data=keep_data)
             recs.append(rec)
             offset += len(rec)
 
@@ -655,20 +768,29 @@ class EventV5(Payload):
         "Return all the trigger records"
 
         # extract the number of trigger records
-        num_recs = struct.unpack(">I", data[offset:offset+4])[0]
+        num_recs = UINT32_STRUCT.unpack_from(data, offset)[0]
         offset += 4
 
+        hdrlen = TriggerRecord.HEADER_LEN
+        unpack_from = TRIGGER_RECORD_STRUCT.unpack_from
+
         recs = []
         for _ in range(num_recs):
-            offend = offset + TriggerRecord.HEADER_LEN
-            rechdr = struct.unpack(">6i", data[offset:offend])
-            rec = TriggerRecord(base_time, rechdr, data,
-                                offset + TriggerRecord.HEADER_LEN)
+            rechdr = unpack_from(data, offset)
+            rec = TriggerRecord(base_time, rechdr, data, offset + hdrlen)
             recs.append(rec)
             offset += len(rec)
 
         return recs, offset
 
+    def discard_data(self):
+        "Drop the raw data bytes, keeping only the parsed header fields"
+        # hit records point into the event buffer, so give them their own
+        #  copies of their data before letting go of it
+        for rec in self.__hit_records:
+            rec.copy_data()
+        super(EventV5, self).discard_data()
+
     def hit(self, idx):
         "Return the requested hit record, or None if the index is not valid"
         if idx < 0 or idx >= len(self.__hit_records):
@@ -730,17 +852,37 @@ class BaseHitRecord(object):
     "Generic hit record class"
     HEADER_LEN = 10
 
-    def __init__(self, base_time, hdr, data, offset):
+    __slots__ = ("__flags", "__chan_id", "__utime", "__buf", "__offset",
+                 "__length")
+
+    def __init__(self, base_time, hdr, data, offset, keep_data=True):
+        """
+        `hdr` is the unpacked record header and `offset` is the index of
+        the first byte after the header.  If `keep_data` is False, the
+        event isn't keeping `data` so the record copies its own bytes.
+        """
         self.__flags = hdr[2]
         self.__chan_id = hdr[3]
         self.__utime = base_time + hdr[4]
-        if hdr[0] == self.HEADER_LEN:
-            self.__data = []
+
+        self.__length = max(hdr[0] - self.HEADER_LEN, 0)
+        if offset + self.__length > len(data):
+            raise PayloadException("Hit record needs %d data bytes, only"
+                                   " %d available" %
+                                   (self.__length, len(data) - offset))
+
+        if keep_data:
+            # the event holds on to the buffer, so just remember where
+            #  this record's data lives
+            self.__buf = data
+            self.__offset = offset
         else:
-            self.__data = data[offset+10:offset+hdr[0]]
+            # don't let one record pin the whole event buffer
+            self.__buf = data[offset:offset + self.__length]
+            self.__offset = 0
 
     def __len__(self):
-        return self.HEADER_LEN + len(self.__data)
+        return self.HEADER_LEN + self.__length
 
     def __str__(self):
         return "%d@%d[flags %x]" % (self.__chan_id, self.__utime, self.__flags)
@@ -750,6 +892,16 @@ class BaseHitRecord(object):
         "Return DOM channel ID"
         return self.__chan_id
 
+    def copy_data(self):
+        "Copy this record's data bytes so it no longer uses the event buffer"
+        self.__buf = bytes(self.data_bytes)
+        self.__offset = 0
+
+    @property
+    def data_bytes(self):
+        "Return the data bytes which follow the record header"
+        return self.__buf[self.__offset:self.__offset + self.__length]
+
     @property
     def flags(self):
         "Return flag bits"
@@ -765,11 +917,22 @@ class DeltaHitRecord(BaseHitRecord):
     "Delta-compressed hit record inside V5 event payload"
     TYPE_ID = 1
 
+    __slots__ = ()
+
 
 class EngineeringHitRecord(BaseHitRecord):
     "Engineering hit record inside V5 event payload"
     TYPE_ID = 0
 
+    __slots__ = ()
+
+
+# map hit record type IDs to the classes which decode them
+HIT_RECORD_CLASSES = {
+    DeltaHitRecord.TYPE_ID: DeltaHitRecord,
+    EngineeringHitRecord.TYPE_ID: EngineeringHitRecord,
+}
+
 
 # pylint: disable=too-few-public-methods
 class Monitor(object):
@@ -789,7 +952,7 @@ class Monitor(object):
         if len(data) < 12:
             raise PayloadException("Truncated monitoring record")
 
-        subhdr = struct.unpack(">Qhh6B", data[:18])
+        subhdr = MONITOR_HEADER_STRUCT.unpack_from(data, 0)
         if subhdr[1] != len(data) - 8:
             raise PayloadException("Expected %d-byte record, not %d" %
                                    (subhdr[1], len(data) - 8))
@@ -1058,10 +1221,10 @@ class TimeCalibration(Payload):
 
         super(TimeCalibration, self).__init__(utime, data, keep_data=keep_data)
 
-        dombytes = struct.unpack(">Q", data[:8])
+        dombytes = UINT64_STRUCT.unpack_from(data, 0)
         self.__dom_id = dombytes[0]
 
-        hdr = struct.unpack("<HHQQ128xQQ128xB12sc", data[8:self.LENGTH - 8])
+        hdr = TCAL_STRUCT.unpack_from(data, 8)
         self.__pktlen = hdr[0]
         self.__format = hdr[1]
         self.__dor_tx = hdr[2]
@@ -1074,7 +1237,7 @@ class TimeCalibration(Payload):
         self.__julianstr = hdr[7]
         self.__quality = hdr[8]
 
-        st = struct.unpack(">Q", data[self.LENGTH - 8:])
+        st = UINT64_STRUCT.unpack_from(data, self.LENGTH - 8)
         self.__synctime = st[0]
 
     def __str__(self):
@@ -1114,19 +1277,19 @@ class TriggerRecord(object):
     "Encoded trigger request inside V5 event payload"
     HEADER_LEN = 24
 
+    __slots__ = ("__type", "__config_id", "__source_id", "__start_time",
+                 "__end_time", "__hit_index")
+
     def __init__(self, base_time, hdr, data, offset):
         self.__type = hdr[0]
         self.__config_id = hdr[1]
         self.__source_id = hdr[2]
         self.__start_time = base_time + hdr[3]
         self.__end_time = base_time + hdr[4]
-        self.__hit_index = []
 
-        num = hdr[5]
-        for _ in range(num):
-            idx = struct.unpack(">I", data[offset:offset+4])
-            self.__hit_index.append(idx[0])
-            offset += 4
+        # unpack all the hit indexes in a single call
+        num = max(hdr[5], 0)
+        self.__hit_index = struct.unpack_from(">%dI" % num, data, offset)
 
     def __len__(self):
         return self.HEADER_LEN + (len(self.__hit_index) * 4)
@@ -1181,6 +1344,10 @@ class TriggerRecord(object):
 
 class PayloadReader(object):
     "Read DAQ payloads from a file"
+
+    # read files in large chunks since most payloads are small
+    BUFFER_SIZE = 1024 * 1024
+
     def __init__(self, filename, keep_data=True):
         """
         Open a payload file
@@ -1189,17 +1356,25 @@ class PayloadReader(object):
             raise PayloadException("Cannot read \"%s\"" % filename)
 
         if filename.endswith(".gz"):
-            fin = gzip.open(filename, "rb")
+            fin = self.__buffered(gzip.open(filename, "rb"))
         elif filename.endswith(".bz2"):
-            fin = bz2.BZ2File(filename)
+            fin = self.__buffered(bz2.BZ2File(filename))
         else:
-            fin = open(filename, "rb")
+            fin = io.open(filename, "rb", buffering=self.BUFFER_SIZE)
 
         self.__filename = filename
         self.__fin = fin
         self.__keep_data = keep_data
         self.__num_read = 0
 
+    @classmethod
+    def __buffered(cls, fin):
+        "Serve small reads from a decompressed stream out of a big buffer"
+        if not hasattr(fin, "readable"):
+            # Python 2's BZ2File doesn't support the 'io' interface
+            return fin
+        return io.BufferedReader(fin, cls.BUFFER_SIZE)
+
     def __enter__(self):
         """
         Return this object as a context manager to used as
@@ -1250,6 +1425,79 @@ class PayloadReader(object):
             finally:
                 self.__fin = None
 
+    def delta_hit_columns(self, batch_size=65536):
+        """
+        Generator which returns the header fields of delta-compressed hits
+        as a dictionary of parallel lists ("utime", "mbid", "word0",
+        "word2", "domclk", "pedestal") holding up to `batch_size` hits,
+        without building a payload object for each hit.  All other
+        payloads are skipped.
+        """
+        fin = self.__fin
+        hdrlen = Payload.ENVELOPE_LENGTH + DELTA_COLUMNS_STRUCT.size
+
+        while fin is not None:
+            utimes = []
+            mbids = []
+            word0s = []
+            word2s = []
+            domclks = []
+            pedestals = []
+
+            while len(utimes) < batch_size:
+                envelope = fin.read(Payload.ENVELOPE_LENGTH)
+                if len(envelope) == 0:  # pylint: disable=len-as-condition
+                    fin = None
+                    break
+
+                length, type_id, mbid = READ_ENVELOPE_STRUCT.unpack(envelope)
+                self.__num_read += 1
+
+                if type_id != DeltaCompressedHit.TYPE_ID:
+                    if length > Payload.ENVELOPE_LENGTH:
+                        fin.seek(length - Payload.ENVELOPE_LENGTH, 1)
+                    continue
+
+                if length < hdrlen:
+                    raise PayloadException("Expected at least %d data bytes,"
+                                           " got %d" %
+                                           (DeltaCompressedHit.MIN_LENGTH,
+                                            length -
+                                            Payload.ENVELOPE_LENGTH))
+
+                hdrbytes = fin.read(DELTA_COLUMNS_STRUCT.size)
+                if len(hdrbytes) != DELTA_COLUMNS_STRUCT.size:
+                    raise PayloadException("Expected at least %d data bytes,"
+                                           " got %d" %
+                                           (DeltaCompressedHit.MIN_LENGTH,
+                                            len(hdrbytes)))
+
+                (utime, order_check, _, pedestal, domclk, word0,
+                 word2) = DELTA_COLUMNS_STRUCT.unpack(hdrbytes)
+                if order_check != 1:
+                    raise PayloadException(("Bad order-check %d for"
+                                            " DeltaSenderHit (should be 1)") %
+                                           order_check)
+                if length > hdrlen:
+                    fin.seek(length - hdrlen, 1)
+
+                utimes.append(utime)
+                mbids.append(mbid)
+                word0s.append(word0)
+                word2s.append(word2)
+                domclks.append(domclk)
+                pedestals.append(pedestal)
+
+            if len(utimes) > 0:  # pylint: disable=len-as-condition
+                yield {
+                    "utime": utimes,
+                    "mbid": mbids,
+                    "word0": word0s,
+                    "word2": word2s,
+                    "domclk": domclks,
+                    "pedestal": pedestals,
+                }
+
     @property
     def nrec(self):
         "Number of payloads read to this point"
@@ -1269,7 +1517,7 @@ class PayloadReader(object):
         if len(envelope) == 0:  # pylint: disable=len-as-condition
             return None
 
-        length, type_id, utime = struct.unpack(">iiq", envelope)
+        length, type_id, utime = READ_ENVELOPE_STRUCT.unpack(envelope)
         if length <= Payload.ENVELOPE_LENGTH:
             rawdata = None
         else:
@@ -1296,8 +1544,23 @@ class PayloadReader(object):
     next = __next__  # XXX backward compatibility for Python 2
 
 
-def read_file(filename, max_payloads, write_simple_hits=False):
-    "Read a binary payload file and print a description of each payload"
+def _describe_file(fargs):
+    """
+    Pool worker which writes the descriptions of all payloads in a file
+    to a new file in `tmpdir` and returns the path of that file
+    """
+    tmpdir, filename, max_payloads, write_simple_hits = fargs
+
+    # write to disk so whole-file output is never held in memory
+    fdesc, path = tempfile.mkstemp(suffix=".txt", dir=tmpdir)
+    with os.fdopen(fdesc, "w") as out:
+        for line in describe_file(filename, max_payloads, write_simple_hits):
+            out.write(line + "\n")
+    return path
+
+
+def describe_file(filename, max_payloads, write_simple_hits=False):
+    "Read a binary payload file and yield a description of each payload"
     if write_simple_hits and filename.startswith("HitSpool-"):
         out = open("SimpleHit-" + filename[9:], "w")
     else:
@@ -1309,7 +1572,7 @@ def read_file(filename, max_payloads, write_simple_hits=False):
                 if max_payloads is not None and rdr.nrec > max_payloads:
                     break
 
-                print(str(pay))
+                yield str(pay)
                 if out is not None:
                     out.write(pay.simple_hit)
     finally:
@@ -1317,6 +1580,25 @@ def read_file(filename, max_payloads, write_simple_hits=False):
             out.close()
 
 
+def list_files(file_list):
+    "Expand any directories in 'file_list' into the files they contain"
+    for fnm in file_list:
+        if os.path.isfile(fnm):
+            yield fnm
+            continue
+
+        for entry in os.listdir(fnm):
+            path = os.path.join(fnm, entry)
+            if os.path.isfile(path):
+                yield path
+
+
+def read_file(filename, max_payloads, write_simple_hits=False):
+    "Read a binary payload file and print a description of each payload"
+    for line in describe_file(filename, max_payloads, write_simple_hits):
+        print(line)
+
+
 def main():
     "Main program"
 
@@ -1325,6 +1607,10 @@ def main():
     parser.add_argument("-S", "--simple-hits", dest="write_simple_hits",
                         action="store_true", default=False,
                         help="Rewrite hits to trigger-friendly SimpleHits")
+    parser.add_argument("-j", "--jobs", type=int,
+                        dest="jobs", default=1,
+                        help="Number of files to decode in parallel"
+                        " (0 uses all CPUs)")
     parser.add_argument("-n", "--max_payloads", type=int,
                         dest="max_payloads", default=None,
                         help="Maximum number of payloads to dump")
@@ -1332,15 +1618,27 @@ def main():
 
     args = parser.parse_args()
 
-    for fnm in args.fileList:
-        if os.path.isfile(fnm):
+    if args.jobs == 1:
+        for fnm in list_files(args.fileList):
             read_file(fnm, args.max_payloads, args.write_simple_hits)
-            continue
+        return
+
+    # files are independent, so decode them in separate processes and
+    #  print each file's payloads in the original order
+    tmpdir = tempfile.mkdtemp(prefix="payload-")
+    fargs = [(tmpdir, fnm, args.max_payloads, args.write_simple_hits)
+             for fnm in list_files(args.fileList)]
+    pool = multiprocessing.Pool(args.jobs if args.jobs > 0 else None)
+    try:
+        for path in pool.imap(_describe_file, fargs, chunksize=1):
+            with open(path) as fin:
+                shutil.copyfileobj(fin, sys.stdout)
+            os.unlink(path)
+    finally:
+        pool.terminate()
+        pool.join()
+        shutil.rmtree(tmpdir, ignore_errors=True)
 
-        for entry in os.listdir(fnm):
-            path = os.path.join(fnm, entry)
-            if os.path.isfile(path):
-                read_file(path, args.max_payloads, args.write_simple_hits)
 
 if __name__ == "__main__":
     main()
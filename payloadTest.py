@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+"""
+Test payload decoding against fixed sample payloads
+"""
+
+import binascii
+import bz2
+import gzip
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+
+import payload
+
+from payload import DeltaCompressedHit, EventV5, PayloadException, \
+     PayloadReader
+
+
+# delta-compressed fADC, ATWD channel 0 and ATWD channel 1 samples
+DELTA_SAMPLES = binascii.unhexlify(
+    "000000000000000000000000801244dfffffffffffffffffffffffffffffffff"
+    "ffffffffffffffffffff4b70cf01089c74d249279d74d249279d74d249279d74"
+    "d249279d74201104411004411004411004411004411004411004411004411004"
+    "4110044110044110044110044110044110044110044110044110044110044110"
+    "0441100441100441100441100441100441100441100441100441100441100441"
+    "100441100421f8bfffffffffffffffffffffffffffffffffffffffffffffffff"
+    "ffffffffffffffffff0700000000")
+
+# waveforms encoded in DELTA_SAMPLES
+EXPECTED_FADC = [0] * 100 + [1000 - i for i in range(100)] + \
+    [512 + (i % 3) for i in range(56)]
+EXPECTED_ATWD = [
+    [(i * 8) % 1024 for i in range(128)],
+    [1023 - i for i in range(128)],
+]
+
+HIT_MBID = 0x1234567890ab
+HIT_UTIME = 123456789012
+HIT_DOMCLK = 0x123456789abc
+# fADC, ATWD (2 channels, chip B), LC 2, hit size 418
+HIT_WORD0 = 0x8000 | 0x4000 | 0x1000 | 0x800 | 0x20000 | 0x1a2
+HIT_WORD2 = 0x87654321
+
+EVENT_UTIME = 100000
+
+
+def delta_hit_data(samples=DELTA_SAMPLES):
+    "Return the data bytes for the sample delta-compressed hit"
+    return struct.pack(">8xQ3HQ2I", HIT_UTIME, 1, 2, 3, HIT_DOMCLK,
+                       HIT_WORD0, HIT_WORD2) + samples
+
+
+def event_data():
+    "Return the data bytes for the sample event"
+    hits = struct.pack(">HBBHI", 14, 1, 3, 17, 10) + b"\x01\x02\x03\x04" + \
+        struct.pack(">HBBHI", 10, 0, 0, 2000, 250)
+    trigs = struct.pack(">6i2I", 2, 3, 6000, 1, 4999, 2, 0, 1) + \
+        struct.pack(">6i", 0, 0, 12001, 10, 20, 0)
+    return struct.pack(">IHIII", 5000, 2020, 42, 123456, 7) + \
+        struct.pack(">I", 2) + hits + struct.pack(">I", 2) + trigs
+
+
+def envelope(length, type_id, utime):
+    "Return a payload envelope for `length` data bytes"
+    return struct.pack(">iiq", length + payload.Payload.ENVELOPE_LENGTH,
+                       type_id, utime)
+
+
+class PayloadTest(unittest.TestCase):
+    "Test delta-compressed hit and event decoding"
+
+    def setUp(self):
+        self.__tmpdir = None
+
+    def tearDown(self):
+        if self.__tmpdir is not None:
+            shutil.rmtree(self.__tmpdir, ignore_errors=True)
+
+    def __check_event(self, evt):
+        self.assertEqual(str(evt), "EventV5[#42 [100000-105000] yr 2020"
+                         " run 123456 hitRecs*2 trigRecs*2]")
+        self.assertEqual(evt.stop_time, 105000)
+        self.assertEqual(evt.run, 123456)
+        self.assertEqual(evt.subrun, 7)
+
+        hits = evt.hits
+        self.assertEqual([type(hit).__name__ for hit in hits],
+                         ["DeltaHitRecord", "EngineeringHitRecord"])
+        self.assertEqual([str(hit) for hit in hits],
+                         ["17@100010[flags 3]", "2000@100250[flags 0]"])
+        self.assertEqual([len(hit) for hit in hits], [14, 10])
+        self.assertEqual(bytes(hits[0].data_bytes), b"\x01\x02\x03\x04")
+        self.assertEqual(bytes(hits[1].data_bytes), b"")
+
+        trigs = evt.triggers
+        self.assertEqual([str(trig) for trig in trigs],
+                         ["TriggerRecord[globalTrigger typ 2 cfg 3"
+                          " [100001-104999] hits*2]",
+                          "TriggerRecord[stringHub-1 typ 0 cfg 0"
+                          " [100010-100020] hits*0]"])
+        self.assertEqual([len(trig) for trig in trigs], [32, 24])
+        self.assertEqual(list(trigs[0].hit_indexes), [0, 1])
+
+    def __write_file(self, name, data, opener=open):
+        if self.__tmpdir is None:
+            self.__tmpdir = tempfile.mkdtemp(prefix="payload-")
+
+        path = os.path.join(self.__tmpdir, name)
+        fout = opener(path, "wb")
+        try:
+            fout.write(data)
+        finally:
+            fout.close()
+        return path
+
+    def test_delta_hit(self):
+        hit = DeltaCompressedHit(HIT_MBID, delta_hit_data())
+
+        self.assertEqual(str(hit), "DeltaCompressedHit@123456789012"
+                         "[v2 1234567890ab]")
+        self.assertEqual(hit.utime, HIT_UTIME)
+        self.assertEqual(hit.domclk, HIT_DOMCLK)
+        self.assertEqual(hit.word(0), HIT_WORD0)
+        self.assertEqual(hit.word(2), HIT_WORD2)
+        self.assertTrue(hit.has_fadc)
+        self.assertTrue(hit.has_atwd)
+        self.assertEqual(hit.atwd_channels, 1)
+        self.assertEqual(hit.atwd_chip, 1)
+        self.assertEqual(hit.hit_size, 418)
+        self.assertEqual(hit.lc, 2)
+        self.assertEqual(hit.chargestamp, (2, 82721, 0, 0))
+
+        self.assertEqual(list(hit.fadc), EXPECTED_FADC)
+        for chan, expected in enumerate(EXPECTED_ATWD):
+            self.assertEqual(list(hit.atwd(chan)), expected)
+
+    def test_delta_hit_discard(self):
+        hit = DeltaCompressedHit(HIT_MBID, delta_hit_data())
+        hit.discard_data()
+
+        self.assertFalse(hit.has_data)
+        self.assertEqual(hit.hit_size, 418)
+        self.assertRaises(PayloadException, lambda: hit.fadc)
+
+    def test_delta_hit_truncated(self):
+        hit = DeltaCompressedHit(HIT_MBID,
+                                 delta_hit_data(DELTA_SAMPLES[:40]))
+
+        self.assertRaises(PayloadException, lambda: hit.fadc)
+
+    def test_event(self):
+        self.__check_event(EventV5(EVENT_UTIME, event_data()))
+
+    def test_event_discard(self):
+        data = event_data()
+        refs = sys.getrefcount(data)
+
+        evt = EventV5(EVENT_UTIME, data, keep_data=False)
+
+        # hit records must not hang on to the whole event
+        self.assertFalse(evt.has_data)
+        self.assertEqual(sys.getrefcount(data), refs)
+        self.__check_event(evt)
+
+    def test_event_discard_data(self):
+        data = event_data()
+        refs = sys.getrefcount(data)
+
+        evt = EventV5(EVENT_UTIME, data)
+        self.assertTrue(evt.has_data)
+        self.assertTrue(sys.getrefcount(data) > refs)
+
+        evt.discard_data()
+
+        # neither the event nor its hit records may still hold the buffer
+        self.assertFalse(evt.has_data)
+        self.assertEqual(sys.getrefcount(data), refs)
+        self.__check_event(evt)
+
+    def test_reader(self):
+        hitdata = delta_hit_data()
+        evtdata = event_data()
+        data = envelope(len(hitdata), DeltaCompressedHit.TYPE_ID,
+                        HIT_MBID) + hitdata + \
+            envelope(len(evtdata), EventV5.TYPE_ID, EVENT_UTIME) + \
+            evtdata + \
+            envelope(4, 99, 12345) + b"\x00\x01\x02\x03" + \
+            envelope(len(hitdata), DeltaCompressedHit.TYPE_ID,
+                     HIT_MBID + 1) + hitdata
+
+        for path in (self.__write_file("hits.dat", data),
+                     self.__write_file("hits.dat.gz", data, gzip.open),
+                     self.__write_file("hits.dat.bz2", data, bz2.BZ2File)):
+            with PayloadReader(path) as rdr:
+                pays = list(rdr)
+
+            self.assertEqual([type(pay).__name__ for pay in pays],
+                             ["DeltaCompressedHit", "EventV5",
+                              "UnknownPayload", "DeltaCompressedHit"])
+            self.assertEqual(list(pays[0].fadc), EXPECTED_FADC)
+            self.__check_event(pays[1])
+            self.assertEqual(str(pays[2]), "UnknownPayload#99[@12345, 20"
+                             " bytes]")
+
+            with PayloadReader(path) as rdr:
+                batches = list(rdr.delta_hit_columns(batch_size=1))
+                self.assertEqual(rdr.nrec, 4)
+
+            self.assertEqual(len(batches), 2)
+            self.assertEqual(batches[0], {
+                "utime": [HIT_UTIME],
+                "mbid": [HIT_MBID],
+                "word0": [HIT_WORD0],
+                "word2": [HIT_WORD2],
+                "domclk": [HIT_DOMCLK],
+                "pedestal": [3],
+            })
+            self.assertEqual(batches[1]["mbid"], [HIT_MBID + 1])
+
+    def test_reader_truncated(self):
+        hitdata = delta_hit_data()
+        data = envelope(len(hitdata), DeltaCompressedHit.TYPE_ID,
+                        HIT_MBID) + hitdata[:20]
+        path = self.__write_file("truncated.dat", data)
+
+        with PayloadReader(path) as rdr:
+            self.assertRaises(PayloadException, list, rdr)
+
+        with PayloadReader(path) as rdr:
+            self.assertRaises(PayloadException, list,
+                              rdr.delta_hit_columns())
+
+
+if __name__ == '__main__':
+    unittest.main()